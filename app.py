@@ -1,31 +1,194 @@
-from dash import Dash, html, dcc, callback, Output, Input
-import pandas as pd
+from profiling import StartupProfile
+
+startup_profile = StartupProfile()
+
+from dash import Dash, html, dcc, Output, Input, State, Patch, ClientsideFunction, no_update
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
-import datetime as dt
-from datetime import datetime, date
+import os
+import threading
+from flask import Response
+from datetime import date
+
+startup_profile.mark('import dash, plotly, pandas')
+
+import config
+from background import background_manager, debounce
+from backends import DuckDBBackend, PandasBackend
+from client_series import base_layout, grouped_series
+from data_loader import dataset_fingerprint, load_dataset, load_metadata
+from density import HOURS, KDE_GRID, HourHistograms, binned_kde
+from downsample import downsample_frame, visible_window
+from extremes import DailyExtremes
+from figure_cache import FigureCache, code_fingerprint
+from figure_pool import FigurePool
+from figures import compact_figure, date_array, install_json_engine, install_template, typed_array
+from ingest import IngestWatcher, describe_batch, overlaps_dates
+from metrics import CallbackMetrics
+from rollups import GASES, build_rollup
+from stats import add_trendlines, grouped_ols, iqr_bounds, remove_outliers_iqr
+
+# Every figure shares one trimmed template (backgrounds, centred titles) and responses are encoded with orjson
+install_template()
+install_json_engine()
+
+startup_profile.mark('import app modules')
+
+
+# Phase timings and counters of every callback, served at /metrics
+callback_metrics = CallbackMetrics(slow_seconds=config.SLOW_CALLBACK_SECONDS)
+
+if config.QUERY_BACKEND == 'duckdb':
+    # The rollup and the hour counts are built from the raw file by DuckDB and read back from Parquet,
+    # so the raw rows are never loaded into pandas
+    backend = DuckDBBackend.open(config.DATASET_PATH, config.PARQUET_DIR,
+                                 memory_limit=config.DUCKDB_MEMORY_LIMIT or None, span=callback_metrics.span)
+    df = None
+    metadata = backend.metadata
+    dataset_id = backend.fingerprint
+    startup_profile.mark('open parquet store')
+    hour_histograms = HourHistograms.from_counts(backend.hour_counts())
+    startup_profile.mark('build hour histograms')
+else:
+    df = load_dataset(config.DATASET_PATH, config.DATASET_CACHE_PATH)
+    # Dropdown options and date bounds come from the cache metadata instead of scans over df
+    metadata = load_metadata(config.DATASET_CACHE_PATH, df)
+    dataset_id = dataset_fingerprint(config.DATASET_PATH, config.DATASET_CACHE_PATH)
+    startup_profile.mark('load dataset')
+    backend = PandasBackend(build_rollup(df), span=callback_metrics.span)
+    startup_profile.mark('build rollup and date indexes')
+    hour_histograms = HourHistograms(df)
+    startup_profile.mark('build hour histograms')
+date_bounds = (date.fromisoformat(metadata['min_date']), date.fromisoformat(metadata['max_date']))
+
+# IQR outlier bounds of the tab-2 AQI columns, per state
+aqi_outlier_bounds = {}
 
+external_stylesheets = ['assets/styles.css']
 
-df = pd.read_csv('./datasets/pollution_2010_2023.csv')
+if config.BACKGROUND_CALLBACKS:
+    background_callback_manager = background_manager(config.BACKGROUND_CACHE_DIR)
+    # Superseded date-picker/hover jobs are cancelled while they wait out the debounce
+    slow_input_debounce = debounce(config.CALLBACK_DEBOUNCE_SECONDS)
+else:
+    background_callback_manager = None
+    slow_input_debounce = debounce(0)
 
-def remove_outliers_iqr(df, columns, threshold=1.5):
-        # Apply outlier removal to specified columns
-        for column in columns:
-            Q1 = df[column].quantile(0.25)
-            Q3 = df[column].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - threshold * IQR
-            upper_bound = Q3 + threshold * IQR
-            df = df[(df[column] >= lower_bound) & (df[column] <= upper_bound)]
-        return df
+app = Dash(title="App", external_stylesheets=external_stylesheets,
+           background_callback_manager=background_callback_manager,
+           # Lazily loaded tabs register callbacks for components that are not in the first layout
+           suppress_callback_exceptions=config.LAZY_TABS)
+# WSGI entry point, e.g. `gunicorn app:server` or `python serve.py`
+server = app.server
+
+figure_cache = FigureCache(max_entries=config.FIGURE_CACHE_ENTRIES,
+                           max_bytes=config.FIGURE_CACHE_MB * 1024 * 1024,
+                           disk_dir=config.FIGURE_CACHE_DIR or None,
+                           max_disk_bytes=config.FIGURE_CACHE_DISK_MB * 1024 * 1024,
+                           namespace=f"{dataset_id}-{code_fingerprint(os.path.dirname(os.path.abspath(__file__)))}")
+
+callback_metrics.attach(server)
+
+# Shared by the callbacks that build several independent figures (disabled when FIGURE_POOL_WORKERS is 0)
+figure_pool = FigurePool(workers=config.FIGURE_POOL_WORKERS, timeout=config.FIGURE_POOL_TIMEOUT_SECONDS,
+                         on_fallback=lambda: callback_metrics.count('figure_pool_fallbacks'),
+                         on_timeout=lambda: callback_metrics.count('figure_pool_timeouts'))
+
+
+def point_curve(event_data):
+    # Hover/click payloads carry coordinates too; only the trace index changes the output
+    if not event_data:
+        return None
+    return event_data['points'][0]['curveNumber']
+
+
+def render_mode(frame):
+    return 'webgl' if len(frame) > config.WEBGL_POINT_THRESHOLD else 'svg'
+
+
+def server_callback(*args, **kwargs):
+    # Date-range callbacks replaced by clientside ones under CLIENTSIDE_DATES stay plain, unregistered functions
+    if config.CLIENTSIDE_DATES:
+        return lambda func: func
+    return app.callback(*args, **kwargs)
+
+
+def gas_label(gas_column):
+    return gas_column.replace('_', ' ').title()
+
+
+def sunburst_figure(state_data2, gas_column):
+    fig = px.sunburst(
+                    state_data2, 
+                    path=['State', 'City'],
+                    color=gas_column,
+                    color_continuous_scale='deep',
+                    color_continuous_midpoint=round(np.average(state_data2[gas_column]),3),
+                    title=f"{gas_label(gas_column)}(ppm) Distribution Across States and Cities",
+                    labels={"State": "State", "City": "City", gas_column: f"{gas_label(gas_column)} Level"}
+                    )
+    fig.update_layout(title_font_size=15)
+    return fig
 
-external_stylesheets = ['assets/styles.css']
 
-app = Dash(title="App", external_stylesheets=external_stylesheets)
+def skeleton_figure(trace, **layout):
+    # Starting figure of a detail chart that its callback fills in with Patch updates
+    fig = go.Figure(trace)
+    fig.update_layout(**layout)
+    return fig
+
+
+# Tab-1 summary statistics per (time zone, gas), built on first use and dropped when a batch touches the time zone
+SUMMARY_GASES = [f"{gas}_Mean" for gas in GASES]
+daily_extremes = {}
+daily_extremes_version = 0
+
+
+def range_extremes(timezone, gas_column):
+    key = (timezone, gas_column)
+    index = daily_extremes.get(key)
+    if index is None:
+        version = daily_extremes_version
+        index = DailyExtremes(backend.aggregate(['Date','State'], sums=[gas_column], time_zone=timezone), gas_column)
+        # A batch applied during the build may not be in it; use it for this call only
+        if version == daily_extremes_version:
+            daily_extremes[key] = index
+    return index
+
+
+def build_range_extremes(time_zones):
+    # Background callbacks run in job processes forked from this one, and an index they build dies with
+    # them. With those on, every index is built here up front and again after each batch instead
+    for timezone in time_zones:
+        for gas_column in SUMMARY_GASES:
+            range_extremes(timezone, gas_column)
+
+
+if config.BACKGROUND_CALLBACKS:
+    build_range_extremes(metadata['time_zones'])
+    startup_profile.mark('build range extremes')
+
+
+KDE_DETAIL_GASES = ['O3', 'NO2', 'SO2', 'CO']
+kde_detail_skeletons = [skeleton_figure(go.Bar(x=HOURS, y=[], width=1, marker_color='turquoise'),
+                                        xaxis_title=f"{gas_type} 1st Max Hour", yaxis_title='count')
+                        for gas_type in KDE_DETAIL_GASES]
+
+
+def state_overview_figure(state_group, cho_gas):
+    return px.scatter(
+                    state_group, 
+                    x=f"{cho_gas}_Mean", 
+                    y=f"{cho_gas}_1st_Max_Hour", 
+                    color="State",
+                    labels={
+                        f"{cho_gas}_Mean": f"{cho_gas} Concentration (ppm,Sum)",
+                        f"{cho_gas}_1st_Max_Hour": f"{cho_gas} First Max Hour",
+                        "State": "State"
+                    },
+                    title=f"Scatter Plot of {cho_gas} Mean Concentration vs First Max Hour by State"
+                )
 
 tab1 = [
         html.Div(children="Atmospheric Watch: Pollution Over Time",
@@ -33,7 +196,7 @@ tab1 = [
         html.Div("Time series analysis plays a crucial role in understanding air pollution in the USA by providing insights into the temporal patterns and trends of pollutant concentrations over time. By analyzing historical data collected from various monitoring stations across the country, researchers and policymakers can identify long-term trends, seasonal variations, and short-term fluctuations in air quality. This information enables the detection of pollution hotspots, the assessment of the effectiveness of pollution control measures, and the prediction of future air quality conditions. Time series analysis helps to uncover underlying patterns in pollution levels, aiding in the development of targeted interventions and policies to mitigate the adverse impacts of air pollution on public health and the environment.",
                  style={'fontSize': 20, 'textAlign': 'justify', 'marginBottom': '30px', 'marginLeft': '30px', 'marginRight': '30px'}),
         html.Div([
-                dcc.Dropdown(options = [{'label': option, 'value': option} for option in df['Time_zone'].unique()],
+                dcc.Dropdown(options = [{'label': option, 'value': option} for option in metadata['time_zones']],
                              value = 'Mountain Time Zone',
                              id='timezone_selector_dropdown',
                              className='dropdown_adjuster'),
@@ -46,13 +209,14 @@ tab1 = [
                              id='gas_selector_dropdown',
                              className='dropdown_adjuster'),
                 dcc.DatePickerRange(id='Time_series_date_picker',
-                                    min_date_allowed=df['Date'].min(),
-                                    max_date_allowed=df['Date'].max(),
+                                    min_date_allowed=date_bounds[0],
+                                    max_date_allowed=date_bounds[1],
                                     start_date=date(2010, 1, 1),
                                     end_date=date(2010, 1, 31),
                                     className='date_picker')],
                 className='dropdown-set'),
         html.Div(className='graph-container',children=[dcc.Graph(id='date_gas_graph1')]),
+        dcc.Store(id='time_series_store1'),
         html.Div([
                 html.Div(children=[
                                 dcc.Graph(id='date_gas_Sunburst1',
@@ -72,7 +236,7 @@ tab2 = [
                 html.A("More details on Air Quality Index visit here", href='https://www.who.int/publications/i/item/9789240034228',
                        style={'fontSize': 20, 'textAlign': 'left', 'marginBottom': '30px', 'marginLeft': '30px', 'marginRight': '30px'})]),
         html.Div([
-                dcc.Dropdown(df['State'].unique(),
+                dcc.Dropdown(metadata['states'],
                             value = "Arizona",
                             id='state_aqi_selector_dropdown',
                             className="dropdown_adjuster2"),
@@ -110,17 +274,20 @@ tab3 = [
                             id='gas_selector_dropdown_2',
                             className="dropdown_adjuster2"),
                 dcc.DatePickerRange(id='Time_series_date_picker2',
-                                    min_date_allowed=df['Date'].min(),
-                                    max_date_allowed=df['Date'].max(),
+                                    min_date_allowed=date_bounds[0],
+                                    max_date_allowed=date_bounds[1],
                                     start_date=date(2010, 1, 1),
                                     end_date=date(2010, 1, 31),
                                     className="date_picker")],
                 className='dropdown-set2'),
         html.Div(className='graph-container',children=[dcc.Graph(id = 'interactive_graph')]),
+        dcc.Store(id='interactive_store'),
         html.Div(className='aligner',
                  children=[
-                           dcc.Graph(id='time_series_1',className='graph-container2'),
-                           dcc.Graph(id='time_series_2',className='graph-container2')
+                           dcc.Graph(id='time_series_1',className='graph-container2',
+                                     figure=skeleton_figure(go.Scatter(x=[], y=[], mode='lines', showlegend=False), xaxis_title='Date', xaxis_type='date')),
+                           dcc.Graph(id='time_series_2',className='graph-container2',
+                                     figure=skeleton_figure(go.Scatter(x=[], y=[], mode='lines', showlegend=False), xaxis_title='Date', xaxis_type='date'))
                            ])
         ]
 
@@ -131,7 +298,7 @@ tab4 = [
         html.Div("Dive into Pollution Profiles, a comprehensive analysis revealing emission distributions across states and cities. This dynamic exploration illuminates the intricate patterns of pollution, integrating kernel density estimation (KDE) for states and histograms for cities. Unveiling the spatial nuances of pollution hotspots, the analysis highlights variations in emissions across different regions. From urban centers to rural landscapes, Pollution Profiles provides insights into the diverse landscapes of pollution, empowering stakeholders to devise targeted strategies for environmental conservation and public health. By scrutinizing emission patterns at both state and city levels, this analysis paves the way for informed decision-making and proactive measures to mitigate pollution's impact.",
                  style={'fontSize': 20, 'textAlign': 'justify', 'marginBottom': '30px', 'marginLeft': '30px', 'marginRight': '30px'}),
         html.Div([
-                dcc.Dropdown(df['State'].unique(), 
+                dcc.Dropdown(metadata['states'], 
                              value = 'Arizona',
                              id='State_selector_dropdown_3',
                              className="dropdown_adjuster2"),
@@ -142,13 +309,13 @@ tab4 = [
         html.Div(className='graph-container',children=[dcc.Graph(id = 'kde_graph')]),
         html.Div(className='aligner',
                  children=[
-                           dcc.Graph(id='kde_graph_sub1',className='graph-container2'),
-                           dcc.Graph(id='kde_graph_sub2',className='graph-container2')
+                           dcc.Graph(id='kde_graph_sub1',className='graph-container2', figure=kde_detail_skeletons[0]),
+                           dcc.Graph(id='kde_graph_sub2',className='graph-container2', figure=kde_detail_skeletons[1])
                            ]),
         html.Div(className='aligner',
                  children=[
-                           dcc.Graph(id='kde_graph_sub3',className='graph-container2'),
-                           dcc.Graph(id='kde_graph_sub4',className='graph-container2')
+                           dcc.Graph(id='kde_graph_sub3',className='graph-container2', figure=kde_detail_skeletons[2]),
+                           dcc.Graph(id='kde_graph_sub4',className='graph-container2', figure=kde_detail_skeletons[3])
                            ])
         ]
 
@@ -170,6 +337,16 @@ footer = html.Div(
 
 
 
+tab_contents = {'tab_1': tab1, 'tab_2': tab2, 'tab_3': tab3, 'tab_4': tab4}
+
+
+def initial_tab_children(value):
+    # With LAZY_TABS only the first tab ships with the page, so only its callbacks fire on load
+    if config.LAZY_TABS and value != 'tab_1':
+        return []
+    return tab_contents[value]
+
+
 app.layout = html.Div(
     className='container',
     children=[
@@ -177,25 +354,53 @@ app.layout = html.Div(
             className='tabs-wrapper',
             children=[
                 dcc.Tabs(
+                    id='tabs',
+                    value='tab_1',
                     className='tabs-container',
                     children=[
-                        dcc.Tab(label='Time Series Analyse', value='tab_1', children=tab1, className='custom-tab'),
-                        dcc.Tab(label='Air Quality Indexes', value='tab_2', children=tab2, className='custom-tab'),
-                        dcc.Tab(label='Interactive Elements', value='tab_3', children=tab3, className='custom-tab'),
-                        dcc.Tab(label='KDE visualization', value='tab_4', children=tab4, className='custom-tab')
+                        dcc.Tab(id='tab_1', label='Time Series Analyse', value='tab_1', children=initial_tab_children('tab_1'), className='custom-tab'),
+                        dcc.Tab(id='tab_2', label='Air Quality Indexes', value='tab_2', children=initial_tab_children('tab_2'), className='custom-tab'),
+                        dcc.Tab(id='tab_3', label='Interactive Elements', value='tab_3', children=initial_tab_children('tab_3'), className='custom-tab'),
+                        dcc.Tab(id='tab_4', label='KDE visualization', value='tab_4', children=initial_tab_children('tab_4'), className='custom-tab')
                     ],
                     vertical=True
                 )
             ]
         ),
-        footer
-    ]
+        footer,
+        dcc.Store(id='loaded_tabs', data=['tab_1'])
+    ] + ([dcc.Interval(id='ingest_interval', interval=config.INGEST_POLL_SECONDS * 1000),
+          dcc.Store(id='date_bounds_store', data=[date_bounds[0].isoformat(), date_bounds[1].isoformat()])]
+         if config.INGEST_DIR else [])
 )
 
+startup_profile.mark('build layout')
+
+
+#lazy tabs: a tab's content is sent the first time it is selected and kept afterwards
+if config.LAZY_TABS:
+    @app.callback(
+        Output(component_id='tab_1', component_property='children'),
+        Output(component_id='tab_2', component_property='children'),
+        Output(component_id='tab_3', component_property='children'),
+        Output(component_id='tab_4', component_property='children'),
+        Output(component_id='loaded_tabs', component_property='data'),
+            Input(component_id='tabs', component_property='value'),
+            State(component_id='loaded_tabs', component_property='data'),
+        prevent_initial_call=True
+    )
+    def tab_loader(selected, loaded):
+        loaded = loaded or []
+        if selected in loaded:
+            return no_update, no_update, no_update, no_update, no_update
+
+        children = [tab_contents[value] if value == selected else no_update for value in tab_contents]
+        return (*children, loaded + [selected])
+
 
 
 #callback for tab1
-@app.callback(
+@server_callback(
     Output(component_id='date_gas_graph1', component_property='figure'),
     Output(component_id='date_gas_Sunburst1', component_property='figure'),
     Output(component_id='date_gas_state1', component_property='children'),
@@ -203,86 +408,124 @@ app.layout = html.Div(
         Input(component_id='timezone_selector_dropdown', component_property='value'),
         Input(component_id='gas_selector_dropdown', component_property='value'),
         Input(component_id='Time_series_date_picker', component_property='start_date'),
-        Input(component_id='Time_series_date_picker', component_property='end_date')
+        Input(component_id='Time_series_date_picker', component_property='end_date'),
+    background=config.BACKGROUND_CALLBACKS
 )
-
+@callback_metrics.instrument
+@figure_cache.memoize(affected_by=lambda key, change: key[0] in change['time_zones'] and overlaps_dates(change, key[2], key[3]))
+@slow_input_debounce
 def time_series_creator1(timezone, gas_column, str_date, end_date):
 
     if str_date and end_date:
-  
-        filtered_data = df[(df['Time_zone'] == timezone) & (df['Date'] >= str_date) & (df['Date'] <= end_date)]
-
-        state_data = filtered_data.groupby(['State','Date']).agg(O3_Mean=pd.NamedAgg(column="O3 Mean", aggfunc="sum"),
-                                                                CO_Mean=pd.NamedAgg(column="CO Mean", aggfunc="sum"),
-                                                                SO2_Mean=pd.NamedAgg(column="SO2 Mean", aggfunc="sum"),
-                                                                NO2_Mean=pd.NamedAgg(column="NO2 Mean", aggfunc="sum")).reset_index()
-        state_data2 = filtered_data.groupby(['State','City']).agg(O3_Mean=pd.NamedAgg(column="O3 Mean", aggfunc="sum"),
-                                                                CO_Mean=pd.NamedAgg(column="CO Mean", aggfunc="sum"),
-                                                                SO2_Mean=pd.NamedAgg(column="SO2 Mean", aggfunc="sum"),
-                                                                NO2_Mean=pd.NamedAgg(column="NO2 Mean", aggfunc="sum")).reset_index()
-        fig1 = px.line(state_data, x="Date", y=gas_column,
-               color="State",
-               title=f"{gas_column.replace('_', ' ').title()} Levels(ppm) Over Time by State",
-               labels={"Date": "Date", gas_column: f"{gas_column.replace('_', ' ').title()} Level (ppm)"},
-               )
-        fig1.update_layout(title_font_size=18, xaxis_title_font_size=14, yaxis_title_font_size=14)
-        
-        formatted_date = pd.to_datetime(state_data['Date']).dt.strftime("%B %d, %Y")
-        fig1.update_traces(hovertext=formatted_date)
-
-        fig2 = px.sunburst(
-                        state_data2, 
-                        path=['State', 'City'],
-                        color=gas_column,
-                        color_continuous_scale='deep',
-                        color_continuous_midpoint=round(np.average(state_data2[gas_column]),3),
-                        title=f"{gas_column.replace('_', ' ').title()}(ppm) Distribution Across States and Cities",
-                        labels={"State": "State", "City": "City", gas_column: f"{gas_column.replace('_', ' ').title()} Level"}
-                        )
-        fig2.update_layout(title_font_size=15)
-
-
-        if not state_data.empty:
-
-            max1 = state_data[gas_column].max()
-            max_state = state_data[state_data[gas_column] == max1]['State'].iloc[0]
-            max_date_str = state_data[state_data[gas_column] == max1]['Date'].iloc[0]
-            max_date = dt.datetime.strptime(max_date_str, '%Y-%m-%d')
-            max_month = max_date.month
-
-            if max_month in [12, 1, 2]:
-                max_season = "winter"
-            elif max_month in [3, 4, 5]:
-                max_season = "spring"
-            elif max_month in [6, 7, 8]:
-                max_season = "summer"
-            elif max_month in [9, 10, 11]:
-                max_season = "autumn"
+
+        state_data = backend.aggregate(['State','Date'], sums=[gas_column], time_zone=timezone, date_range=(str_date, end_date))
+        state_data2 = backend.aggregate(['State','City'], sums=[gas_column], time_zone=timezone, date_range=(str_date, end_date))
+        callback_metrics.count('rows_scanned', state_data.attrs['rows_scanned'])
+
+        with callback_metrics.span('aggregate'):
+            line_data = downsample_frame(state_data, 'Date', gas_column, config.PLOT_WIDTH_PX, by='State')
+        callback_metrics.count('groups_produced', len(state_data) + len(state_data2))
+
+        def line_figure():
+            fig1 = px.line(line_data, x="Date", y=gas_column,
+                   color="State",
+                   title=f"{gas_label(gas_column)} Levels(ppm) Over Time by State",
+                   labels={"Date": "Date", gas_column: f"{gas_label(gas_column)} Level (ppm)"},
+                   render_mode=render_mode(line_data)
+                   )
+            fig1.update_layout(title_font_size=18, xaxis_title_font_size=14, yaxis_title_font_size=14)
+            # Keeps the user's zoom while time_series_zoom1 swaps in finer data
+            fig1.update_layout(uirevision=f"{timezone}|{gas_column}|{str_date}|{end_date}")
+            # Formatted by the browser instead of shipping a date string per point
+            fig1.update_xaxes(hoverformat="%B %d, %Y")
+            return compact_figure(fig1)
+
+        with callback_metrics.span('figure'):
+            fig1, fig2 = figure_pool.build(line_figure, lambda: compact_figure(sunburst_figure(state_data2, gas_column)))
+
+        extremes = range_extremes(timezone, gas_column)
+        with callback_metrics.span('aggregate'):
+            summary = extremes.summary(str_date, end_date)
+            if summary is not None:
+
+                max_state, max_date, max1 = summary['max']
+                max_date = max_date.to_pydatetime()
+                max_month = max_date.month
+
+                if max_month in [12, 1, 2]:
+                    max_season = "winter"
+                elif max_month in [3, 4, 5]:
+                    max_season = "spring"
+                elif max_month in [6, 7, 8]:
+                    max_season = "summer"
+                elif max_month in [9, 10, 11]:
+                    max_season = "autumn"
+                else:
+                    max_season = "Unknown"
+
+
+                min_state, min_date, min1 = summary['min']
+                min_date = min_date.strftime('%Y-%m-%d')
+
+                mean_value = summary['mean']
+                median_value = summary['median']
+
+                statement = [
+                            f"The highest recorded level of {gas_column} was observed in {max_state}, reaching {max1:.3f}. This level signifies significant {gas_column} pollution. Time series analysis reveals seasonal fluctuations, particularly peaking during {max_season} months. For instance, on {max_date}, {gas_column} levels spiked to {max1:.3f}, emphasizing the health risks associated with elevated {gas_column} concentrations during {max_season} seasons. Conversely, {min_state} exhibits the lowest {gas_column} levels, recorded at {min1:.3f} on {min_date}, suggesting effective pollution control measures or geographical advantages. On average, across all states, {gas_column} levels remain around {mean_value:.3f}, with a median value of {median_value:.3f}, indicating the typical distribution of {gas_column} concentrations across the dataset."
+                        ]
+
             else:
-                max_season = "Unknown"
+                statement = ["No data available.", "No data available."]
 
+    return fig1, fig2, statement
 
-            min1 = state_data[gas_column].min()
-            min_state = state_data[state_data[gas_column] == min1]['State'].iloc[0]
-            min_date = state_data[state_data[gas_column] == min1]['Date'].iloc[0]
 
-            mean_value = state_data[gas_column].mean()
-            median_value = state_data[gas_column].median()
+@figure_cache.memoize(affected_by=lambda key, change: key[0] in change['time_zones'] and overlaps_dates(change, key[2], key[3]))
+def state_series_window(timezone, gas_column, str_date, end_date, window_start, window_end):
+    # One (dates, values) pair per trace of date_gas_graph1, restricted to the visible window
+    states = backend.aggregate(['State'], sums=[gas_column], time_zone=timezone, date_range=(str_date, end_date))['State']
+    window_data = backend.aggregate(['State','Date'], sums=[gas_column], time_zone=timezone, date_range=(window_start, window_end))
+    callback_metrics.count('rows_scanned', window_data.attrs['rows_scanned'])
+
+    with callback_metrics.span('aggregate'):
+        window_data = downsample_frame(window_data, 'Date', gas_column, config.PLOT_WIDTH_PX, by='State')
+    callback_metrics.count('groups_produced', len(window_data))
+
+    series = []
+    for state in states:
+        rows = window_data[window_data['State'] == state]
+        series.append((rows['Date'].to_numpy(), rows[gas_column].to_numpy()))
+    return series
+
+
+#zoom on tab1: only the visible window is fetched again, at full resolution when it is short enough
+@server_callback(
+    Output(component_id='date_gas_graph1', component_property='figure', allow_duplicate=True),
+        Input(component_id='date_gas_graph1', component_property='relayoutData'),
+        State(component_id='timezone_selector_dropdown', component_property='value'),
+        State(component_id='gas_selector_dropdown', component_property='value'),
+        State(component_id='Time_series_date_picker', component_property='start_date'),
+        State(component_id='Time_series_date_picker', component_property='end_date'),
+    prevent_initial_call=True
+)
+@callback_metrics.instrument
+def time_series_zoom1(relayout_data, timezone, gas_column, str_date, end_date):
 
-            statement = [
-                        f"The highest recorded level of {gas_column} was observed in {max_state}, reaching {max1:.3f}. This level signifies significant {gas_column} pollution. Time series analysis reveals seasonal fluctuations, particularly peaking during {max_season} months. For instance, on {max_date}, {gas_column} levels spiked to {max1:.3f}, emphasizing the health risks associated with elevated {gas_column} concentrations during {max_season} seasons. Conversely, {min_state} exhibits the lowest {gas_column} levels, recorded at {min1:.3f} on {min_date}, suggesting effective pollution control measures or geographical advantages. On average, across all states, {gas_column} levels remain around {mean_value:.3f}, with a median value of {median_value:.3f}, indicating the typical distribution of {gas_column} concentrations across the dataset."
-                    ]
-               
-        else:
-            statement = ["No data available.", "No data available."]
-    
-    figs = [fig1,fig2]
+    if not (str_date and end_date):
+        return no_update
 
-    for i in range(2):
-        figs[i].update_layout(paper_bgcolor='rgba(255,255,255,0.5)', plot_bgcolor='rgba(255,255,255,0.5)')
-        figs[i].update_layout(title_x=0.5)
+    window = visible_window(relayout_data, str_date, end_date)
+    if window is None:
+        return no_update
 
-    return fig1, fig2, statement
+    series = state_series_window(timezone, gas_column, str_date, end_date, *window)
+
+    with callback_metrics.span('figure'):
+        patch = Patch()
+        for i, (dates, values) in enumerate(series):
+            patch['data'][i]['x'] = date_array(dates)
+            patch['data'][i]['y'] = typed_array(values, 'f4')
+    return patch
 
 
 #callback for tab2
@@ -294,198 +537,490 @@ Output(component_id='gas_aqi_graph3', component_property='figure'),
     Input(component_id='state_aqi_selector_dropdown', component_property='value'),
     Input(component_id='gas_aqi_selector_dropdown', component_property='value')
 )
-
+@callback_metrics.instrument
+@figure_cache.memoize(affected_by=lambda key, change: key[0] in change['states'])
 def scatter_creator(cho_state, gas_type):
     
-    state_selector = df[df['State'] == cho_state]
-
-    state_data_aqi = state_selector.groupby(['City','Date']).agg(O3_AQI=pd.NamedAgg(column="O3 AQI", aggfunc="mean"),
-                                                                CO_AQI=pd.NamedAgg(column="CO AQI", aggfunc="mean"),
-                                                                SO2_AQI=pd.NamedAgg(column="SO2 AQI", aggfunc="mean"),
-                                                                NO2_AQI=pd.NamedAgg(column="NO2 AQI", aggfunc="mean")).reset_index()
-
-    columns_to_clean = ["O3_AQI", "CO_AQI", "SO2_AQI", "NO2_AQI"]
-    state_data_aqi = remove_outliers_iqr(state_data_aqi, columns_to_clean)
-    # Extract gas name from gas type
-    gas_name = gas_type.split('_')[0]
-
-    correlation = round(state_data_aqi['O3_AQI'].corr(state_data_aqi[gas_type]),3)
+    state_data_aqi = backend.aggregate(['City','Date'], means=["O3_AQI", "CO_AQI", "SO2_AQI", "NO2_AQI"], state=cho_state)
+    callback_metrics.count('rows_scanned', state_data_aqi.attrs['rows_scanned'])
+
+    with callback_metrics.span('aggregate'):
+        columns_to_clean = ["O3_AQI", "CO_AQI", "SO2_AQI", "NO2_AQI"]
+        by = 'City' if config.OUTLIER_BOUNDS_PER_CITY else None
+        bounds = aqi_outlier_bounds.get(cho_state)
+        if bounds is None:
+            bounds = iqr_bounds(state_data_aqi, columns_to_clean, by=by)
+            # A cleared dropdown sends None, which selects no rows and is not a state to remember
+            if cho_state is not None:
+                aqi_outlier_bounds[cho_state] = bounds
+        state_data_aqi = remove_outliers_iqr(state_data_aqi, columns_to_clean, by=by, bounds=bounds)
+        # Extract gas name from gas type
+        gas_name = gas_type.split('_')[0]
+
+        correlation = round(state_data_aqi['O3_AQI'].corr(state_data_aqi[gas_type]),3)
+        trendlines = grouped_ols(state_data_aqi, "O3_AQI", gas_type, by="City")
+    callback_metrics.count('groups_produced', len(state_data_aqi))
 
     # Scatter plot (fig1) modifications
-    fig1 = px.scatter(state_data_aqi, x="O3_AQI", y=gas_type, color="City", trendline="ols")
-    fig1.update_layout(
-        title=f"{gas_name} AQI vs Ozone (O3) AQI Across Cities (Overall Correlattion: {correlation})",
-        xaxis_title="Ozone (O3) Air Quality Index (AQI)",
-        yaxis_title=f"{gas_name} Air Quality Index (AQI)"
-    )
+    def scatter_figure():
+        fig1 = px.scatter(state_data_aqi, x="O3_AQI", y=gas_type, color="City")
+        add_trendlines(fig1, trendlines, by="City")
+        fig1.update_layout(
+            title=f"{gas_name} AQI vs Ozone (O3) AQI Across Cities (Overall Correlattion: {correlation})",
+            xaxis_title="Ozone (O3) Air Quality Index (AQI)",
+            yaxis_title=f"{gas_name} Air Quality Index (AQI)"
+        )
+        return compact_figure(fig1)
 
     # Box plot (fig2) modifications
-    fig2 = px.box(state_data_aqi, x="City", y="O3_AQI", color="City")
-    fig2.update_layout(
-        title=f"Variation in Ozone (O3) AQI Across Cities",
-        xaxis_title="City",
-        yaxis_title="Ozone (O3) Air Quality Index (AQI)"
-    )
+    def o3_box_figure():
+        fig2 = px.box(state_data_aqi, x="City", y="O3_AQI", color="City")
+        fig2.update_layout(
+            title=f"Variation in Ozone (O3) AQI Across Cities",
+            xaxis_title="City",
+            yaxis_title="Ozone (O3) Air Quality Index (AQI)"
+        )
+        return compact_figure(fig2)
 
     # Another Box plot (fig3) modifications
-    fig3 = px.box(state_data_aqi, x="City", y=gas_type, color="City")
-    fig3.update_layout(
-        title=f"Variation in {gas_name} AQI Across Cities",
-        xaxis_title="City",
-        yaxis_title=f"{gas_name} Air Quality Index (AQI)"
-    )
-
-    figs = [fig1, fig2, fig3]
-
-    for i in range(3):
-        figs[i].update_layout(paper_bgcolor='rgba(255,255,255,0.5)', plot_bgcolor='rgba(255,255,255,0.5)')
-        figs[i].update_layout(title_x=0.5)
+    def gas_box_figure():
+        fig3 = px.box(state_data_aqi, x="City", y=gas_type, color="City")
+        fig3.update_layout(
+            title=f"Variation in {gas_name} AQI Across Cities",
+            xaxis_title="City",
+            yaxis_title=f"{gas_name} Air Quality Index (AQI)"
+        )
+        return compact_figure(fig3)
+
+    with callback_metrics.span('figure'):
+        fig1, fig2, fig3 = figure_pool.build(scatter_figure, o3_box_figure, gas_box_figure)
 
     return fig1, fig2, fig3
 
 
 
-#callback for tab3
+#callback for tab3: the overview only depends on the gas, hovering patches the two detail charts
 @app.callback(
     Output(component_id='interactive_graph', component_property='figure'),
+        Input(component_id='gas_selector_dropdown_2', component_property='value')
+)
+@callback_metrics.instrument
+@figure_cache.memoize()
+def interactive_overview(cho_gas):
+
+    state_group = backend.aggregate(['State'], sums=[f"{cho_gas}_Mean"], means=[f"{cho_gas}_1st_Max_Hour"])
+    callback_metrics.count('rows_scanned', state_group.attrs['rows_scanned'])
+    callback_metrics.count('groups_produced', len(state_group))
+
+    with callback_metrics.span('figure'):
+        fig = compact_figure(state_overview_figure(state_group, cho_gas))
+    return fig
+
+
+def hovered_state(hoverData):
+    # The overview has one trace per state, in the order the backend groups states
+    return backend.states()[hoverData['points'][0]['curveNumber']]
+
+
+def detail_series(cho_gas, state_name, date_str, date_end):
+    # (dates, values) of the mean and of the 1st max hour, each downsampled on its own
+    # Group by date within the selected state and aggregate
+    state_group_df = backend.aggregate(['Date'], sums=[f"{cho_gas}_Mean"], means=[f"{cho_gas}_1st_Max_Hour"],
+                                       state=state_name, date_range=(date_str, date_end))
+    callback_metrics.count('rows_scanned', state_group_df.attrs['rows_scanned'])
+
+    with callback_metrics.span('aggregate'):
+        series = []
+        for column in [f"{cho_gas}_Mean", f"{cho_gas}_1st_Max_Hour"]:
+            sampled = downsample_frame(state_group_df, 'Date', column, config.PLOT_WIDTH_PX)
+            series.append((sampled['Date'].to_numpy(), sampled[column].to_numpy()))
+    callback_metrics.count('groups_produced', len(state_group_df))
+    return series
+
+
+@figure_cache.memoize(affected_by=lambda key, change: key[1] in change['states'] and overlaps_dates(change, key[2], key[3]))
+@slow_input_debounce
+def state_detail_series(cho_gas, state_name, date_str, date_end):
+    return detail_series(cho_gas, state_name, date_str, date_end)
+
+
+@figure_cache.memoize(affected_by=lambda key, change: key[1] in change['states'] and overlaps_dates(change, key[2], key[3]))
+def state_detail_window(cho_gas, state_name, window_start, window_end):
+    # Same series restricted to the window a detail chart is zoomed into; zooming is not debounced
+    return detail_series(cho_gas, state_name, window_start, window_end)
+
+
+def detail_trace_patch(patch, column, dates, values):
+    patch['data'][0]['x'] = date_array(dates)
+    patch['data'][0]['y'] = typed_array(values, 'f4')
+    patch['data'][0]['type'] = 'scattergl' if len(dates) > config.WEBGL_POINT_THRESHOLD else 'scatter'
+    patch['data'][0]['hovertemplate'] = f"Date=%{{x}}<br>{column}=%{{y}}<extra></extra>"
+    return patch
+
+
+@server_callback(
     Output('time_series_1', 'figure'),
     Output('time_series_2', 'figure'),
         Input(component_id='gas_selector_dropdown_2', component_property='value'),
         Input(component_id='Time_series_date_picker2', component_property='start_date'),
         Input(component_id='Time_series_date_picker2', component_property='end_date'),
-        Input(component_id='interactive_graph', component_property='hoverData')
+        Input(component_id='interactive_graph', component_property='hoverData'),
+    background=config.BACKGROUND_CALLBACKS
 )
+@callback_metrics.instrument
+def interactive_detail(cho_gas,date_str,date_end,hoverData):
+
+    if date_str is None or date_end is None or hoverData is None:
+        return no_update, no_update
+
+    state_name = hovered_state(hoverData)
+    # The debounce sits behind the memoized series, so a state that is already cached is patched at once
+    series = state_detail_series(cho_gas, state_name, date_str, date_end)
+    titles = [f"Avarage {cho_gas} (ppm) for {state_name}", f"{cho_gas} 1st Max Hour for {state_name}"]
+
+    # Only the trace data and the titles change; layout and template stay in the browser
+    with callback_metrics.span('figure'):
+        patches = []
+        for column, title, (dates, values) in zip([f"{cho_gas}_Mean", f"{cho_gas}_1st_Max_Hour"], titles, series):
+            patch = detail_trace_patch(Patch(), column, dates, values)
+            patch['layout']['title']['text'] = title
+            patch['layout']['yaxis']['title']['text'] = column
+            # Keeps the user's zoom while the zoom callbacks swap in finer data; a new selection resets it
+            patch['layout']['uirevision'] = f"{cho_gas}|{state_name}|{date_str}|{date_end}"
+            patches.append(patch)
+    return patches[0], patches[1]
+
+
+#zoom on tab3: each detail chart fetches its visible window again, like time_series_zoom1 on tab1
+def interactive_zoom(series_index, relayout_data, cho_gas, date_str, date_end, hoverData):
+
+    if date_str is None or date_end is None or hoverData is None:
+        return no_update
+
+    window = visible_window(relayout_data, date_str, date_end)
+    if window is None:
+        return no_update
+
+    column = [f"{cho_gas}_Mean", f"{cho_gas}_1st_Max_Hour"][series_index]
+    dates, values = state_detail_window(cho_gas, hovered_state(hoverData), *window)[series_index]
+
+    with callback_metrics.span('figure'):
+        return detail_trace_patch(Patch(), column, dates, values)
+
+
+def interactive_zoom_callback(graph_id):
+    return server_callback(
+        Output(component_id=graph_id, component_property='figure', allow_duplicate=True),
+            Input(component_id=graph_id, component_property='relayoutData'),
+            State(component_id='gas_selector_dropdown_2', component_property='value'),
+            State(component_id='Time_series_date_picker2', component_property='start_date'),
+            State(component_id='Time_series_date_picker2', component_property='end_date'),
+            State(component_id='interactive_graph', component_property='hoverData'),
+        prevent_initial_call=True
+    )
 
 
-def interactive_creator(cho_gas,date_str,date_end,hoverData):
+@interactive_zoom_callback('time_series_1')
+@callback_metrics.instrument
+def interactive_zoom1(relayout_data, cho_gas, date_str, date_end, hoverData):
+    return interactive_zoom(0, relayout_data, cho_gas, date_str, date_end, hoverData)
 
-    mean_column = f"{cho_gas} Mean"
-    max_hour_column = f"{cho_gas} 1st Max Hour"
-    
-    state_group = df.groupby(['State']).agg(
-        **{
-            f"{cho_gas}_Mean": pd.NamedAgg(column=mean_column, aggfunc="sum"),
-            f"{cho_gas}_1st_Max_Hour": pd.NamedAgg(column=max_hour_column, aggfunc="mean")
-        }
-    ).reset_index()
-
-    fig = px.scatter(
-                    state_group, 
-                    x=f"{cho_gas}_Mean", 
-                    y=f"{cho_gas}_1st_Max_Hour", 
-                    color="State",
-                    labels={
-                        f"{cho_gas}_Mean": f"{cho_gas} Concentration (ppm,Sum)",
-                        f"{cho_gas}_1st_Max_Hour": f"{cho_gas} First Max Hour",
-                        "State": "State"
-                    },
-                    title=f"Scatter Plot of {cho_gas} Mean Concentration vs First Max Hour by State"
-                )
 
+@interactive_zoom_callback('time_series_2')
+@callback_metrics.instrument
+def interactive_zoom2(relayout_data, cho_gas, date_str, date_end, hoverData):
+    return interactive_zoom(1, relayout_data, cho_gas, date_str, date_end, hoverData)
 
-    fig1 = go.Figure()
-    fig2 = go.Figure()
-    
-    if date_str is not None and date_end is not None and hoverData is not None:        
-
-        filtered_df = df[(df['Date'] >= date_str) & (df['Date'] <= date_end)]
-        state_number = hoverData['points'][0]['curveNumber']
-        state_name = state_group['State'][state_number] 
-        state_df = filtered_df[filtered_df['State'] == state_name]
-
-        # Define aggregation specifications
-        agg_spec = {
-            f"{cho_gas}_Mean": pd.NamedAgg(column=f"{cho_gas} Mean", aggfunc="sum"),
-            f"{cho_gas}_1st_Max_Hour": pd.NamedAgg(column=f"{cho_gas} 1st Max Hour", aggfunc="mean")
-        }
-        
-        # Group by date within the selected state and aggregate
-        state_group_df = state_df.groupby(['Date']).agg(**agg_spec).reset_index()
-
-        # Generate plots
-        fig1 = px.line(state_group_df, x='Date', y=f'{cho_gas}_Mean', 
-                    title=f"Avarage {cho_gas} (ppm) for {state_name}")
-        fig2 = px.line(state_group_df, x='Date', y=f'{cho_gas}_1st_Max_Hour', 
-                    title=f"{cho_gas} 1st Max Hour for {state_name}")
-        
-    figs = [fig,fig1,fig2]
-
-    for i in range(3):
-        figs[i].update_layout(paper_bgcolor='rgba(255,255,255,0.5)', plot_bgcolor='rgba(255,255,255,0.5)')
-        figs[i].update_layout(title_x=0.5)
-
-    return fig, fig1, fig2
-
-
-#callback for tab4
+
+#clientside date slicing: the per-date series is sent once per selection and date changes never reach the server
+if config.CLIENTSIDE_DATES:
+    @app.callback(
+        Output(component_id='time_series_store1', component_property='data'),
+            Input(component_id='timezone_selector_dropdown', component_property='value'),
+            Input(component_id='gas_selector_dropdown', component_property='value')
+    )
+    @callback_metrics.instrument
+    @figure_cache.memoize(affected_by=lambda key, change: key[0] in change['time_zones'])
+    def time_series_store1(timezone, gas_column):
+
+        state_data = backend.aggregate(['State','Date'], sums=[gas_column], time_zone=timezone)
+        callback_metrics.count('rows_scanned', state_data.attrs['rows_scanned'])
+        callback_metrics.count('groups_produced', len(state_data))
+
+        layout = base_layout(title={'text': f"{gas_label(gas_column)} Levels(ppm) Over Time by State", 'x': 0.5, 'font': {'size': 18}},
+                             xaxis={'title': {'text': "Date", 'font': {'size': 14}}},
+                             yaxis={'title': {'text': f"{gas_label(gas_column)} Level (ppm)", 'font': {'size': 14}}},
+                             legend={'title': {'text': "State"}, 'tracegroupgap': 0})
+        # float64 values, so the statement quotes the same numbers as the server-side callback
+        store = grouped_series(state_data, 'State', [gas_column], config.WEBGL_POINT_THRESHOLD, layout, dtype='f8')
+        store['gas'] = gas_column
+        return store
+
+
+    @app.callback(
+        Output(component_id='date_gas_Sunburst1', component_property='figure'),
+            Input(component_id='timezone_selector_dropdown', component_property='value'),
+            Input(component_id='gas_selector_dropdown', component_property='value'),
+            Input(component_id='Time_series_date_picker', component_property='start_date'),
+            Input(component_id='Time_series_date_picker', component_property='end_date')
+    )
+    @callback_metrics.instrument
+    @figure_cache.memoize(affected_by=lambda key, change: key[0] in change['time_zones'] and overlaps_dates(change, key[2], key[3]))
+    def time_series_sunburst1(timezone, gas_column, str_date, end_date):
+        # The sunburst needs city totals for the range, which the per-(State, Date) store does not carry
+        if not (str_date and end_date):
+            return no_update
+
+        state_data2 = backend.aggregate(['State','City'], sums=[gas_column], time_zone=timezone, date_range=(str_date, end_date))
+        callback_metrics.count('rows_scanned', state_data2.attrs['rows_scanned'])
+        callback_metrics.count('groups_produced', len(state_data2))
+
+        with callback_metrics.span('figure'):
+            fig2 = compact_figure(sunburst_figure(state_data2, gas_column))
+        return fig2
+
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='dates', function_name='timeSeries1'),
+        Output(component_id='date_gas_graph1', component_property='figure'),
+        Output(component_id='date_gas_state1', component_property='children'),
+            Input(component_id='time_series_store1', component_property='data'),
+            Input(component_id='Time_series_date_picker', component_property='start_date'),
+            Input(component_id='Time_series_date_picker', component_property='end_date')
+    )
+
+
+    @app.callback(
+        Output(component_id='interactive_store', component_property='data'),
+            Input(component_id='gas_selector_dropdown_2', component_property='value'),
+            Input(component_id='interactive_graph', component_property='hoverData')
+    )
+    @callback_metrics.instrument
+    @figure_cache.memoize(key=lambda cho_gas, hoverData: (cho_gas, point_curve(hoverData)))
+    def interactive_store(cho_gas, hoverData):
+
+        layout = base_layout()
+        if hoverData is None:
+            return {'layout': layout}
+
+        state_name = hovered_state(hoverData)
+        state_group_df = backend.aggregate(['State','Date'], sums=[f"{cho_gas}_Mean"], means=[f"{cho_gas}_1st_Max_Hour"],
+                                           state=state_name)
+        callback_metrics.count('rows_scanned', state_group_df.attrs['rows_scanned'])
+        callback_metrics.count('groups_produced', len(state_group_df))
+
+        store = grouped_series(state_group_df, 'State', [f"{cho_gas}_Mean", f"{cho_gas}_1st_Max_Hour"],
+                               config.WEBGL_POINT_THRESHOLD, layout)
+        store['figures'] = [
+            {'column': f"{cho_gas}_Mean",
+             'layout': {'title': {'text': f"Avarage {cho_gas} (ppm) for {state_name}", 'x': 0.5},
+                        'xaxis': {'title': {'text': 'Date'}}, 'yaxis': {'title': {'text': f"{cho_gas}_Mean"}}}},
+            {'column': f"{cho_gas}_1st_Max_Hour",
+             'layout': {'title': {'text': f"{cho_gas} 1st Max Hour for {state_name}", 'x': 0.5},
+                        'xaxis': {'title': {'text': 'Date'}}, 'yaxis': {'title': {'text': f"{cho_gas}_1st_Max_Hour"}}}},
+        ]
+        return store
+
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='dates', function_name='stateSeries'),
+        Output('time_series_1', 'figure'),
+        Output('time_series_2', 'figure'),
+            Input(component_id='interactive_store', component_property='data'),
+            Input(component_id='Time_series_date_picker2', component_property='start_date'),
+            Input(component_id='Time_series_date_picker2', component_property='end_date')
+    )
+
+
+#callback for tab4: the density overview only depends on state and gas, clicking patches the four city charts
 @app.callback(
     Output(component_id='kde_graph', component_property='figure'),
+        Input(component_id='State_selector_dropdown_3', component_property='value'),
+        Input(component_id='gas_selector_dropdown_3', component_property='value')
+)
+@callback_metrics.instrument
+@figure_cache.memoize(affected_by=lambda key, change: key[0] in change['states'])
+def kde_overview(state_selected,cho_gas):
+
+    # Per-city hour histograms are built at load time; the density curves come straight from them
+    with callback_metrics.span('filter'):
+        labels, counts = hour_histograms.state(state_selected, cho_gas)
+    callback_metrics.count('rows_scanned', len(labels))
+
+    with callback_metrics.span('aggregate'):
+        totals = counts.sum(axis=1, keepdims=True)
+        densities = binned_kde(counts) if labels else []
+    callback_metrics.count('groups_produced', len(labels))
+    colors = px.colors.qualitative.Plotly
+
+    with callback_metrics.span('figure'):
+        fig = go.Figure()
+
+        for i, city in enumerate(labels):
+            fig.add_trace(go.Bar(x=HOURS, y=counts[i] / max(totals[i][0], 1), width=1,
+                                 name=city, legendgroup=city, marker_color=colors[i % len(colors)]))
+        for i, city in enumerate(labels):
+            fig.add_trace(go.Scatter(x=KDE_GRID, y=densities[i], mode='lines',
+                                     name=city, legendgroup=city, showlegend=False,
+                                     marker_color=colors[i % len(colors)]))
+
+        fig.update_layout(barmode='overlay', hovermode='closest', legend_traceorder='reversed')
+
+        for trace in fig['data']:
+            trace['opacity'] = 0.75
+    
+        fig.update_layout(
+                        title={
+                            'text': f"Distribution of {cho_gas} 1st Max Hour in {state_selected}",
+                            'x':0.5
+                        },
+                        xaxis_title=f"{cho_gas} 1st Max Hour",
+                        yaxis_title="Density")
+        fig = compact_figure(fig)
+
+    return fig
+
+
+@app.callback(
     Output(component_id='kde_graph_sub1', component_property='figure'),
     Output(component_id='kde_graph_sub2', component_property='figure'),
     Output(component_id='kde_graph_sub3', component_property='figure'),
     Output(component_id='kde_graph_sub4', component_property='figure'),
-
         Input(component_id='kde_graph', component_property='clickData'),
-        Input(component_id='State_selector_dropdown_3', component_property='value'),
-        Input(component_id='gas_selector_dropdown_3', component_property='value')
-
+        Input(component_id='State_selector_dropdown_3', component_property='value')
 )
+@callback_metrics.instrument
+def kde_detail(click_data,state_selected):
 
-def kde_creator(click_data,state_selected,cho_gas):
+    labels = hour_histograms.cities.get(state_selected, [])
+    if click_data is None or not labels:
+        return no_update, no_update, no_update, no_update
 
-    cal_data = df[df['State'] == state_selected]
-        
-    data = []
-    labels = []
+    # Bars and density curves share the city order, so both map back to the same city
+    with callback_metrics.span('filter'):
+        city_number = click_data['points'][0]['curveNumber']
+        city_name = labels[city_number % len(labels)] 
+        city_counts = hour_histograms.city(state_selected, city_name)
+    callback_metrics.count('rows_scanned', 1)
+
+    # The skeleton figures already hold the bar trace and axis titles; only counts and titles change
+    with callback_metrics.span('figure'):
+        patches = []
+        for gas_type in KDE_DETAIL_GASES:
+            patch = Patch()
+            patch['data'][0]['y'] = city_counts[gas_type]
+            patch['layout']['title']['text'] = f"Hourly Distribution of {gas_type} Peaks in {city_name}"
+            patches.append(patch)
+    return tuple(patches)
+
+
+#live ingestion: new batches are folded into the rollups (or the Parquet store) without a restart
+ingest_lock = threading.Lock()
+ingest_watcher = None
+
+
+def apply_batch(batch):
+    global backend, date_bounds, daily_extremes_version
+
+    with ingest_lock:
+        merged = backend.merged(build_rollup(batch))
+        change = describe_batch(batch)
+
+        backend = merged
+        daily_extremes_version += 1
+        for key in [key for key in daily_extremes if key[0] in change['time_zones']]:
+            daily_extremes.pop(key, None)
+        if config.BACKGROUND_CALLBACKS:
+            build_range_extremes(change['time_zones'])
+        hour_histograms.add(batch)
+        date_bounds = (min(date_bounds[0], change['start'].date()), max(date_bounds[1], change['end'].date()))
+
+        for state in change['states']:
+            aqi_outlier_bounds.pop(state, None)
+        figure_cache.invalidate(change, batch.attrs.get('source'))
+
+
+def start_ingest_watcher():
+    # One watcher per process; gunicorn workers call this after fork
+    global ingest_watcher
+    if config.INGEST_DIR and ingest_watcher is None:
+        ingest_watcher = IngestWatcher(config.INGEST_DIR, apply_batch, config.INGEST_POLL_SECONDS).start()
+    return ingest_watcher
+
+
+if config.INGEST_DIR:
+    # The browser sends the bounds it already has, so an interval without new dates gets an empty response.
+    # Bounds rather than a counter: every gunicorn worker applies the batches on its own schedule
+    @app.callback(
+        Output(component_id='date_bounds_store', component_property='data'),
+            Input(component_id='ingest_interval', component_property='n_intervals'),
+            State(component_id='date_bounds_store', component_property='data'),
+        prevent_initial_call=True
+    )
+    def date_bounds_updater(n_intervals, known_bounds):
+        bounds = [date_bounds[0].isoformat(), date_bounds[1].isoformat()]
+        if known_bounds == bounds:
+            return no_update
+        return bounds
 
-    column_gas = f'{cho_gas} 1st Max Hour'
-    
-    grouped = cal_data.groupby('City')
-        
-    for city, group in grouped:
-        data.append(group[column_gas].values)
-        labels.append(city)
+    # One clientside callback per picker, since a lazily loaded tab's picker may not exist yet; it also
+    # runs when the picker appears, so a tab loaded after an ingest starts with the current bounds
+    for picker_id in ['Time_series_date_picker', 'Time_series_date_picker2']:
+        app.clientside_callback(
+            ClientsideFunction(namespace='dates', function_name='dateBounds'),
+            Output(component_id=picker_id, component_property='min_date_allowed'),
+            Output(component_id=picker_id, component_property='max_date_allowed'),
+                Input(component_id='date_bounds_store', component_property='data')
+        )
 
-    bin_size = [1 for _ in data]
-    
-    fig = ff.create_distplot(data, labels, bin_size=bin_size, show_rug=False)
 
-    for trace in fig['data']:
-        trace['opacity'] = 0.75
-    
-    fig.update_layout(paper_bgcolor='rgba(255,255,255,0.5)', plot_bgcolor='rgba(255,255,255,0.5)')
-    fig.update_layout(title_x=0.5)
-    fig.update_layout(
-                    title={
-                        'text': f"Distribution of {cho_gas} 1st Max Hour in {state_selected}",
-                        'x':0.5
-                    },
-                    xaxis_title=f"{cho_gas} 1st Max Hour",
-                    yaxis_title="Density")
+@server.route('/figure-cache/stats')
+def figure_cache_stats():
+    return figure_cache.stats()
 
-    figs = [go.Figure() for _ in range(4)]
 
-    if click_data is not None:
-        city_number = click_data['points'][0]['curveNumber']
-        city_names = list(grouped.groups.keys())
-        city_name = city_names[city_number] 
-        city_df = cal_data[cal_data['City'] == city_name]
+@server.route('/metrics')
+def metrics_endpoint():
+    cache = figure_cache.stats()
+    families = [(f"dash_figure_cache_{name}_total", 'counter', f"Figure cache {name.replace('_', ' ')}", [({}, cache[name])])
+                for name in ['hits', 'misses', 'disk_hits', 'evictions', 'disk_evictions', 'invalidations']]
+    families += [('dash_figure_cache_entries', 'gauge', "Entries held in memory", [({}, cache['entries'])]),
+                 ('dash_figure_cache_bytes', 'gauge', "Pickled size of the in-memory entries", [({}, cache['bytes'])])]
+    return Response(callback_metrics.render(families), mimetype='text/plain; version=0.0.4')
+
+
+@server.route('/startup-profile')
+def startup_profile_report():
+    return startup_profile.as_dict()
+
+
+startup_profile.mark('register callbacks')
+
+
+if config.FIGURE_CACHE_PREWARM:
+    # Default selection of every tab, in the form the browser sends it
+    if config.CLIENTSIDE_DATES:
+        date_calls = [
+            (time_series_store1, ('Mountain Time Zone', 'O3_Mean')),
+            (time_series_sunburst1, ('Mountain Time Zone', 'O3_Mean', '2010-01-01', '2010-01-31')),
+            (interactive_store, ('O3', None)),
+        ]
+    else:
+        date_calls = [(time_series_creator1, ('Mountain Time Zone', 'O3_Mean', '2010-01-01', '2010-01-31'))]
+    figure_cache.prewarm(date_calls + [
+        (scatter_creator, ('Arizona', 'CO_AQI')),
+        (interactive_overview, ('O3',)),
+        (kde_overview, ('Arizona', 'O3')),
+    ], background=config.FIGURE_CACHE_PREWARM_BACKGROUND)
+    startup_profile.mark('pre-warm figure cache')
 
-        for i, gas_type in enumerate(['O3', 'NO2', 'SO2', 'CO']):
-            figs[i] = px.histogram(city_df,
-                                    x=f"{gas_type} 1st Max Hour",
-                                    title=f"Hourly Distribution of {gas_type} Peaks in {city_name}",
-                                    labels={'x': f"{gas_type} First Max Hour", 'count': 'Frequency'},
-                                    color_discrete_sequence=['turquoise'])
 
-            
-    for i in range(4):
-        i -= 1
-        figs[i].update_layout(paper_bgcolor='rgba(255,255,255,0.5)', plot_bgcolor='rgba(255,255,255,0.5)')
-        figs[i].update_layout(title_x=0.5)
+if config.INGEST_AUTOSTART:
+    start_ingest_watcher()
 
-    return fig, figs[0], figs[1], figs[2], figs[3]
+if config.STARTUP_PROFILE:
+    print(startup_profile.report())
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=config.DEBUG)
\ No newline at end of file
@@ -0,0 +1,178 @@
+// Clientside date-range slicing for CLIENTSIDE_DATES: the server sends a compact per-date series once per
+// selection (see client_series.py) and every date-picker change is answered here without a round trip.
+// Also spreads the date bounds of live ingestion onto the pickers.
+(function () {
+    var DAY_MS = 86400000;
+    var MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                  'August', 'September', 'October', 'November', 'December'];
+    var ARRAY_TYPES = {i4: Int32Array, f4: Float32Array, f8: Float64Array};
+
+    function decode(typed) {
+        var binary = atob(typed.bdata);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new ARRAY_TYPES[typed.dtype](bytes.buffer);
+    }
+
+    // Stores are decoded once and reused while the same store object comes back with new dates
+    var decoded = new WeakMap();
+
+    function arrays(store) {
+        var cached = decoded.get(store);
+        if (!cached) {
+            cached = {dates: decode(store.dates), columns: {}};
+            Object.keys(store.columns).forEach(function (name) {
+                cached.columns[name] = decode(store.columns[name]);
+            });
+            decoded.set(store, cached);
+        }
+        return cached;
+    }
+
+    function dayNumber(text) {
+        // DatePickerRange sends 'YYYY-MM-DD', sometimes with a time part
+        var parts = text.slice(0, 10).split('-');
+        return Math.round(Date.UTC(+parts[0], parts[1] - 1, +parts[2]) / DAY_MS);
+    }
+
+    function isoDate(day) {
+        return new Date(day * DAY_MS).toISOString().slice(0, 10);
+    }
+
+    function longDate(day) {
+        var date = new Date(day * DAY_MS);
+        var dayOfMonth = date.getUTCDate();
+        return MONTHS[date.getUTCMonth()] + ' ' + (dayOfMonth < 10 ? '0' : '') + dayOfMonth + ', ' + date.getUTCFullYear();
+    }
+
+    function lowerBound(values, lo, hi, value) {
+        while (lo < hi) {
+            var mid = (lo + hi) >> 1;
+            if (values[mid] < value) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo;
+    }
+
+    // Rows [lo, hi) of group g whose date lies in the inclusive range
+    function rowRange(store, dates, g, start, end) {
+        var lo = lowerBound(dates, store.offsets[g], store.offsets[g + 1], start);
+        return [lo, lowerBound(dates, lo, store.offsets[g + 1], end + 1)];
+    }
+
+    function lineTrace(name, x, y, yLabel, type) {
+        return {
+            type: type, mode: 'lines', name: name, legendgroup: name, showlegend: true,
+            x: x, y: y, hovertemplate: 'Date=%{x}<br>' + yLabel + '=%{y}<extra></extra>'
+        };
+    }
+
+    function season(month) {
+        if (month === 12 || month <= 2) { return 'winter'; }
+        if (month <= 5) { return 'spring'; }
+        if (month <= 8) { return 'summer'; }
+        return 'autumn';
+    }
+
+    function statement(gas, points) {
+        // Same wording and statistics as the server-side time_series_creator1
+        if (!points.values.length) {
+            return ['No data available.', 'No data available.'];
+        }
+        var values = points.values, max = 0, min = 0, sum = 0;
+        for (var i = 0; i < values.length; i++) {
+            if (values[i] > values[max]) { max = i; }
+            if (values[i] < values[min]) { min = i; }
+            sum += values[i];
+        }
+        var sorted = Float64Array.from(values).sort();
+        var middle = sorted.length >> 1;
+        var median = sorted.length % 2 ? sorted[middle] : (sorted[middle - 1] + sorted[middle]) / 2;
+        var maxSeason = season(new Date(points.dates[max] * DAY_MS).getUTCMonth() + 1);
+        var maxValue = values[max].toFixed(3);
+
+        return ['The highest recorded level of ' + gas + ' was observed in ' + points.groups[max] + ', reaching ' + maxValue +
+                '. This level signifies significant ' + gas + ' pollution. Time series analysis reveals seasonal fluctuations, particularly peaking during ' +
+                maxSeason + ' months. For instance, on ' + isoDate(points.dates[max]) + ' 00:00:00, ' + gas + ' levels spiked to ' + maxValue +
+                ', emphasizing the health risks associated with elevated ' + gas + ' concentrations during ' + maxSeason + ' seasons. Conversely, ' +
+                points.groups[min] + ' exhibits the lowest ' + gas + ' levels, recorded at ' + values[min].toFixed(3) + ' on ' + isoDate(points.dates[min]) +
+                ', suggesting effective pollution control measures or geographical advantages. On average, across all states, ' + gas +
+                ' levels remain around ' + (sum / values.length).toFixed(3) + ', with a median value of ' + median.toFixed(3) +
+                ', indicating the typical distribution of ' + gas + ' concentrations across the dataset.'];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        dates: {
+            // tab 1: one line per state of the time zone, plus the summary statement
+            timeSeries1: function (store, startDate, endDate) {
+                if (!store || !startDate || !endDate) {
+                    return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+                }
+                var data = arrays(store), values = data.columns[store.gas];
+                var start = dayNumber(startDate), end = dayNumber(endDate);
+                var yLabel = store.layout.yaxis.title.text;
+                var traces = [], points = {groups: [], dates: [], values: []}, total = 0;
+
+                store.groups.forEach(function (state, g) {
+                    var range = rowRange(store, data.dates, g, start, end), x = [], y = [], hovertext = [];
+                    for (var row = range[0]; row < range[1]; row++) {
+                        x.push(isoDate(data.dates[row]));
+                        y.push(values[row]);
+                        hovertext.push(longDate(data.dates[row]));
+                        points.groups.push(state);
+                        points.dates.push(data.dates[row]);
+                        points.values.push(values[row]);
+                    }
+                    if (x.length) {
+                        var trace = lineTrace(state, x, y, yLabel, 'scatter');
+                        trace.hovertext = hovertext;
+                        trace.hovertemplate = 'State=' + state + '<br>' + trace.hovertemplate;
+                        traces.push(trace);
+                        total += x.length;
+                    }
+                });
+                traces.forEach(function (trace) {
+                    trace.type = total > store.webgl_threshold ? 'scattergl' : 'scatter';
+                });
+
+                var layout = Object.assign({}, store.layout, {uirevision: store.gas + '|' + startDate + '|' + endDate});
+                return [{data: traces, layout: layout}, statement(store.gas, points)];
+            },
+
+            // tab 3: the hovered state's series, one figure per entry of store.figures
+            stateSeries: function (store, startDate, endDate) {
+                if (!store || !store.groups || !store.groups.length || !startDate || !endDate) {
+                    var empty = {data: [], layout: store ? store.layout : {}};
+                    return [empty, empty];
+                }
+                var data = arrays(store);
+                var range = rowRange(store, data.dates, 0, dayNumber(startDate), dayNumber(endDate));
+                var type = range[1] - range[0] > store.webgl_threshold ? 'scattergl' : 'scatter';
+                var x = [];
+                for (var row = range[0]; row < range[1]; row++) {
+                    x.push(isoDate(data.dates[row]));
+                }
+
+                return store.figures.map(function (figure) {
+                    var y = Array.from(data.columns[figure.column].subarray(range[0], range[1]));
+                    var trace = lineTrace(figure.column, x, y, figure.column, type);
+                    trace.showlegend = false;
+                    return {data: [trace], layout: Object.assign({}, store.layout, figure.layout)};
+                });
+            },
+
+            // live ingestion: copies the [min, max] dates of date_bounds_store onto a date picker
+            dateBounds: function (bounds) {
+                if (!bounds) {
+                    return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+                }
+                return [bounds[0], bounds[1]];
+            }
+        }
+    });
+})();
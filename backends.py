@@ -0,0 +1,281 @@
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from data_loader import dataset_fingerprint
+from date_index import DateRangeIndex
+from rollups import GASES, MEASURES, ROLLUP_KEYS, merge_rollups, rollup_agg
+
+
+# Bump whenever the Parquet layout or the stored metadata change so existing stores get rebuilt
+PARQUET_VERSION = 1
+PARTITION_KEYS = ['Time_zone', 'Year']
+# Default of the time zone and state filters. None is a real filter value: a cleared dropdown sends it,
+# and like the raw `== None` comparison it matches no rows
+UNFILTERED = object()
+
+
+@contextmanager
+def _no_span(phase):
+    yield
+
+
+def _check_columns(by, sums, means):
+    # Measure and group-by names come from dropdown values the browser sends, and Dash does not check
+    # them against the options; anything outside the rollup is refused before it reaches a query
+    unknown = [column for column in by if column not in ROLLUP_KEYS]
+    unknown += [measure for measure in [*sums, *means] if measure not in MEASURES]
+    if unknown:
+        raise ValueError(f"Unknown rollup columns: {unknown!r}")
+
+
+def _identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _date_bounds(date_range):
+    start, end = date_range if date_range else (None, None)
+    return (pd.Timestamp(start).date() if start is not None else None,
+            pd.Timestamp(end).date() if end is not None else None)
+
+
+class PandasBackend:
+    # The rollup cube held in memory; time zone and state filters are block slices of a DateRangeIndex
+
+    def __init__(self, cube, span=_no_span):
+        self.cube = cube
+        self.span = span
+        self.indexes = {key: DateRangeIndex(cube, key) for key in ['Time_zone', 'State']}
+
+    def states(self):
+        # Block order of the state index, which is also the row order of aggregate(['State'])
+        return [str(state) for state in self.indexes['State'].blocks]
+
+    def aggregate(self, by, sums=(), means=(), time_zone=UNFILTERED, state=UNFILTERED, date_range=None):
+        # rollup_agg over the rollup rows matching the filters; rows_scanned goes into attrs
+        _check_columns(by, sums, means)
+        start, end = date_range if date_range else (None, None)
+        with self.span('filter'):
+            if time_zone is not UNFILTERED:
+                rows = self.indexes['Time_zone'].slice(time_zone, start, end)
+            elif state is not UNFILTERED:
+                rows = self.indexes['State'].slice(state, start, end)
+            else:
+                rows = self.cube
+                if start is not None:
+                    rows = rows[rows['Date'] >= pd.Timestamp(start)]
+                if end is not None:
+                    rows = rows[rows['Date'] <= pd.Timestamp(end)]
+            if time_zone is not UNFILTERED and state is not UNFILTERED:
+                rows = rows[rows['State'] == state]
+
+        with self.span('aggregate'):
+            result = rollup_agg(rows, by, sums=sums, means=means)
+        result.attrs['rows_scanned'] = len(rows)
+        return result
+
+    def merged(self, batch_cube):
+        # A new backend over the merged cube; readers keep using the old one until it is swapped in
+        return PandasBackend(merge_rollups(self.cube, batch_cube), self.span)
+
+
+class DuckDBBackend:
+    # The rollup written to Parquet partitioned by time zone and year, queried in place by DuckDB.
+    # A time zone or date filter only opens the matching partitions, and the Date/State row-group
+    # statistics skip the rest, so the raw rows never have to fit in memory.
+
+    def __init__(self, directory, memory_limit=None, span=_no_span):
+        import duckdb
+
+        self.duckdb = duckdb
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.span = span
+        with open(os.path.join(directory, 'dataset.json')) as file:
+            stored = json.load(file)
+        self.fingerprint = stored['fingerprint']
+        self.metadata = stored['metadata']
+        self.sources = [os.path.join(directory, 'rollup', '**', '*.parquet')]
+        self.ingest_dir = None
+        self.state_order = None
+        self.lock = threading.Lock()
+        self.database = None
+        self.local = threading.local()
+
+    @classmethod
+    def open(cls, source_path, directory, memory_limit=None, span=_no_span):
+        # Builds the Parquet store from the raw CSV/Parquet file when it is missing or stale
+        if os.path.exists(source_path):
+            fingerprint = dataset_fingerprint(source_path)
+            if _stored_key(directory) != [fingerprint, PARQUET_VERSION]:
+                build_parquet_store(source_path, directory, fingerprint, memory_limit)
+        return cls(directory, memory_limit, span)
+
+    def _connection(self):
+        # One in-memory database per process (a forked worker opens its own) and one cursor per thread
+        pid = os.getpid()
+        with self.lock:
+            if self.database is None or self.database[0] != pid:
+                self.database = (pid, _connect(self.duckdb, self.directory, self.memory_limit))
+        if getattr(self.local, 'pid', None) != pid:
+            self.local.pid = pid
+            self.local.cursor = self.database[1].cursor()
+        return self.local.cursor
+
+    def _scan(self):
+        paths = ', '.join(_literal(path) for path in self.sources)
+        return f"read_parquet([{paths}], hive_partitioning=true, union_by_name=true)"
+
+    def states(self):
+        if self.state_order is None:
+            rows = self._connection().execute(f'SELECT DISTINCT "State" FROM {self._scan()} ORDER BY "State"').fetchall()
+            self.state_order = [row[0] for row in rows]
+        return self.state_order
+
+    def aggregate(self, by, sums=(), means=(), time_zone=UNFILTERED, state=UNFILTERED, date_range=None):
+        # Same frame as PandasBackend.aggregate, grouped by DuckDB while it scans
+        _check_columns(by, sums, means)
+        keys = ', '.join(_identifier(column) for column in by)
+        columns = [f'SUM({_identifier(measure + "_sum")}) AS {_identifier(measure)}' for measure in sums]
+        columns += [f'SUM({_identifier(measure + "_sum")}) / SUM({_identifier(measure + "_count")}) AS {_identifier(measure)}'
+                    for measure in means]
+
+        conditions, parameters = [], []
+        if time_zone is not UNFILTERED:
+            conditions.append('"Time_zone" = ?')
+            parameters.append(time_zone)
+        if state is not UNFILTERED:
+            conditions.append('"State" = ?')
+            parameters.append(state)
+        start, end = _date_bounds(date_range)
+        # The Year bounds prune partitions, the Date bounds prune row groups
+        if start is not None:
+            conditions += ['"Year" >= ?', '"Date" >= ?']
+            parameters += [start.year, start]
+        if end is not None:
+            conditions += ['"Year" <= ?', '"Date" <= ?']
+            parameters += [end.year, end]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        query = (f"SELECT {keys}, {', '.join(columns)}, COUNT(*) AS __rows FROM {self._scan()} {where} "
+                 f"GROUP BY {keys} ORDER BY {keys}")
+        with self.span('filter'):
+            result = self._connection().execute(query, parameters).df()
+
+        rows_scanned = int(result.pop('__rows').sum())
+        if 'Date' in result:
+            result['Date'] = pd.to_datetime(result['Date'])
+        result.attrs['rows_scanned'] = rows_scanned
+        return result
+
+    def hour_counts(self):
+        # Long (State, City, Gas, Hour, Count) frame for HourHistograms.from_counts
+        return self._connection().execute(
+            f"SELECT * FROM read_parquet({_literal(os.path.join(self.directory, 'hours.parquet'))})").df()
+
+    def merged(self, batch_cube):
+        # Rollup rows are additive, so a batch is one more set of files under the same scan. They go to a
+        # directory of this process only: every process applies the drop directory itself
+        if batch_cube.empty:
+            return self
+        if self.ingest_dir is None:
+            self.ingest_dir = tempfile.mkdtemp(prefix=f"ingest-{os.getpid()}-", dir=self.directory)
+            atexit.register(shutil.rmtree, self.ingest_dir, True)
+        batch = batch_cube.assign(**{key: batch_cube[key].astype(str) for key in ['Time_zone', 'State', 'City']},
+                                  Year=batch_cube['Date'].dt.year)
+
+        connection = self._connection()
+        connection.register('batch_rollup', batch)
+        try:
+            connection.execute(f"COPY batch_rollup TO {_literal(self.ingest_dir)} "
+                               f"(FORMAT PARQUET, PARTITION_BY ({', '.join(PARTITION_KEYS)}), "
+                               f"FILENAME_PATTERN 'batch_{{uuid}}', OVERWRITE_OR_IGNORE)")
+        finally:
+            connection.unregister('batch_rollup')
+
+        self.sources = self.sources[:1] + [os.path.join(self.ingest_dir, '**', '*.parquet')]
+        self.state_order = None
+        return self
+
+
+def _literal(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def _connect(duckdb, directory, memory_limit=None):
+    connection = duckdb.connect()
+    # Aggregations larger than the memory limit spill next to the store instead of failing
+    connection.execute(f"SET temp_directory = {_literal(os.path.join(directory, '.spill'))}")
+    if memory_limit:
+        connection.execute(f"SET memory_limit = {_literal(memory_limit)}")
+    return connection
+
+
+def _stored_key(directory):
+    try:
+        with open(os.path.join(directory, 'dataset.json')) as file:
+            stored = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return [stored.get('fingerprint'), stored.get('version')]
+
+
+def build_parquet_store(source_path, directory, fingerprint, memory_limit=None):
+    # Streams the raw file through DuckDB once: the (Time_zone, State, City, Date) rollup partitioned
+    # by time zone and year, the per-city hour counts of the KDE tab, and the layout metadata
+    import duckdb
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix='.parquet-build-', dir=parent)
+    connection = _connect(duckdb, build_dir, memory_limit)
+
+    reader = 'read_parquet' if source_path.endswith('.parquet') else 'read_csv'
+    connection.execute(f"CREATE VIEW source AS SELECT * FROM {reader}({_literal(source_path)})")
+
+    keys = ', '.join(f'"{key}"' for key in ROLLUP_KEYS)
+    aggregations = []
+    for measure, column in MEASURES.items():
+        aggregations += [f'SUM("{column}") AS "{measure}_sum"', f'COUNT("{column}")::INTEGER AS "{measure}_count"']
+    # Sorted by State inside every file, so a state filter skips most row groups as well
+    connection.execute(
+        f"COPY (SELECT {keys}, year(\"Date\") AS \"Year\", {', '.join(aggregations)} FROM source "
+        f"WHERE \"Time_zone\" IS NOT NULL AND \"State\" IS NOT NULL AND \"City\" IS NOT NULL "
+        f"GROUP BY {keys} ORDER BY \"State\", \"Date\") "
+        f"TO {_literal(os.path.join(build_dir, 'rollup'))} (FORMAT PARQUET, PARTITION_BY ({', '.join(PARTITION_KEYS)}))")
+
+    # Same validity rules as HourHistograms.add: whole hours 0-23, missing values skipped
+    hours = ' UNION ALL '.join(
+        f"SELECT \"State\", \"City\", '{gas}' AS \"Gas\", floor(\"{gas} 1st Max Hour\")::INTEGER AS \"Hour\", "
+        f"COUNT(*) AS \"Count\" FROM source WHERE \"State\" IS NOT NULL AND \"City\" IS NOT NULL "
+        f"AND \"{gas} 1st Max Hour\" BETWEEN 0 AND 23 GROUP BY ALL"
+        for gas in GASES)
+    connection.execute(f"COPY ({hours}) TO {_literal(os.path.join(build_dir, 'hours.parquet'))} (FORMAT PARQUET)")
+
+    states, time_zones, min_date, max_date, rows = connection.execute(
+        "SELECT list(DISTINCT \"State\" ORDER BY \"State\") FILTER (WHERE \"State\" IS NOT NULL), "
+        "list(DISTINCT \"Time_zone\" ORDER BY \"Time_zone\") FILTER (WHERE \"Time_zone\" IS NOT NULL), "
+        "min(\"Date\")::DATE, max(\"Date\")::DATE, COUNT(*) FROM source").fetchone()
+    connection.close()
+
+    stored = {
+        'fingerprint': fingerprint,
+        'version': PARQUET_VERSION,
+        'metadata': {'states': states, 'time_zones': time_zones,
+                     'min_date': min_date.isoformat(), 'max_date': max_date.isoformat(), 'rows': rows},
+    }
+    with open(os.path.join(build_dir, 'dataset.json'), 'w') as file:
+        json.dump(stored, file)
+
+    # Swap the finished store in; a half-written build is never visible under `directory`
+    old_dir = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(build_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
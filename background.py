@@ -0,0 +1,25 @@
+import time
+from functools import wraps
+
+
+def background_manager(cache_dir):
+    # Local job manager for Dash background callbacks: jobs run in subprocesses, results go through diskcache
+    import diskcache
+    from dash import DiskcacheManager
+
+    return DiskcacheManager(diskcache.Cache(cache_dir), expire=60 * 60)
+
+
+def debounce(seconds):
+    # Runs inside a background job. A newer request for the same callback makes Dash terminate
+    # the superseded job, so a burst that lands inside the wait only computes its last value.
+    def decorator(func):
+        if seconds <= 0:
+            return func
+
+        @wraps(func)
+        def wrapper(*args):
+            time.sleep(seconds)
+            return func(*args)
+        return wrapper
+    return decorator
@@ -0,0 +1,214 @@
+import argparse
+import datetime as dt
+import inspect
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic_data import dataset_path
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCALES = '100k,1M,10M'
+
+
+def parse_scale(text):
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    text = text.strip().lower()
+    if text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+def build_sweeps(app):
+    # Representative inputs per callback, drawn from the loaded dataset; sorted, since the metadata of
+    # the two query backends lists states and time zones in different orders
+    time_zones = sorted(app.metadata['time_zones'])[:4]
+    states = sorted(app.metadata['states'])[:5]
+    first = dt.date.fromisoformat(app.metadata['min_date'])
+    last = dt.date.fromisoformat(app.metadata['max_date'])
+    ranges = [
+        (first.isoformat(), (first + dt.timedelta(days=30)).isoformat()),
+        (first.isoformat(), (first + dt.timedelta(days=365)).isoformat()),
+        (first.isoformat(), last.isoformat()),
+    ]
+    hovers = [None, {'points': [{'curveNumber': 0}]}, {'points': [{'curveNumber': len(states) // 2}]}]
+
+    return {
+        'time_series_creator1': [(zone, gas, start, end)
+                                 for zone in time_zones
+                                 for gas in ['O3_Mean', 'CO_Mean', 'SO2_Mean', 'NO2_Mean']
+                                 for start, end in ranges],
+        'scatter_creator': [(state, gas)
+                            for state in states
+                            for gas in ['CO_AQI', 'SO2_AQI', 'NO2_AQI']],
+        'interactive_overview': [(gas,) for gas in ['O3', 'CO', 'SO2', 'NO2']],
+        'interactive_detail': [(gas, start, end, hover)
+                               for gas in ['O3', 'CO']
+                               for start, end in ranges
+                               for hover in hovers],
+        'kde_overview': [(state, gas)
+                         for state in states
+                         for gas in ['O3', 'NO2']],
+        'kde_detail': [(click, state)
+                       for state in states
+                       for click in [None, {'points': [{'curveNumber': 0}]}, {'points': [{'curveNumber': 1}]}]],
+    }
+
+
+def summarize(latencies, payloads, peaks):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'calls': len(latencies),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies_ms, 50)), 3),
+            'p90': round(float(np.percentile(latencies_ms, 90)), 3),
+            'p99': round(float(np.percentile(latencies_ms, 99)), 3),
+            'mean': round(float(latencies_ms.mean()), 3),
+            'max': round(float(latencies_ms.max()), 3),
+        },
+        'peak_memory_mb': round(max(peaks) / 1e6, 3),
+        'payload_bytes': {'mean': int(np.mean(payloads)), 'max': int(max(payloads))},
+    }
+
+
+def run_worker(dataset, backend, figure_pool_workers, repeats, memory_samples, result_path):
+    # Runs in a fresh process per scale so app.py loads exactly that dataset
+    os.environ.update({
+        'DATASET_PATH': dataset,
+        'DATASET_CACHE_PATH': f"{os.path.splitext(dataset)[0]}.arrow",
+        'QUERY_BACKEND': backend,
+        'PARQUET_DIR': f"{os.path.splitext(dataset)[0]}.parquet",
+        'FIGURE_POOL_WORKERS': str(figure_pool_workers),
+        'FIGURE_CACHE_DIR': '',
+        # Memoized helpers called from inside a callback must miss as well
+        'FIGURE_CACHE_ENTRIES': '0',
+        'FIGURE_CACHE_PREWARM': 'false',
+        'BACKGROUND_CALLBACKS': 'false',
+        'INGEST_DIR': '',
+    })
+    cache_path = os.environ['PARQUET_DIR' if backend == 'duckdb' else 'DATASET_CACHE_PATH']
+    cache_existed = os.path.exists(cache_path)
+    sys.path.insert(0, REPO_ROOT)
+
+    started = time.perf_counter()
+    import app
+    startup = time.perf_counter() - started
+
+    from plotly.io.json import to_json_plotly
+
+    callbacks = {}
+    for name, calls in build_sweeps(app).items():
+        # The figure cache would turn every repeat into a hit; time the callback itself
+        func = inspect.unwrap(getattr(app, name))
+        func(*calls[0])
+
+        latencies, payloads, peaks = [], [], []
+        for repeat in range(repeats):
+            for args in calls:
+                start = time.perf_counter()
+                outputs = func(*args)
+                latencies.append(time.perf_counter() - start)
+                if repeat == 0:
+                    payloads.append(len(to_json_plotly(outputs)))
+
+        for args in calls[:memory_samples]:
+            tracemalloc.start()
+            func(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        callbacks[name] = summarize(latencies, payloads, peaks)
+
+    result = {
+        'backend': backend,
+        'figure_pool_workers': figure_pool_workers,
+        'rows': int(app.metadata['rows'] if app.df is None else len(app.df)),
+        'states': len(app.metadata['states']),
+        'cities': len(app.hour_histograms.keys),
+        'dataset_cache_existed': cache_existed,
+        'startup_s': round(startup, 3),
+        'startup_profile': app.startup_profile.as_dict(),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'callbacks': callbacks,
+    }
+    with open(result_path, 'w') as file:
+        json.dump(result, file)
+
+
+def run(scales, backend, figure_pool_workers, n_states, cities_per_state, repeats, memory_samples, data_dir):
+    results = {}
+    for scale in scales:
+        rows = parse_scale(scale)
+        dataset = dataset_path(data_dir, rows, n_states, cities_per_state)
+
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as file:
+            result_path = file.name
+        try:
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_callbacks', '--worker', dataset, '--backend', backend,
+                            '--figure-pool-workers', str(figure_pool_workers),
+                            '--repeats', str(repeats), '--memory-samples', str(memory_samples),
+                            '--result', result_path],
+                           cwd=REPO_ROOT, check=True)
+            with open(result_path) as file:
+                results[scale] = json.load(file)
+        finally:
+            os.remove(result_path)
+
+        print_scale(scale, results[scale])
+
+    return {
+        'created': dt.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'backend': backend, 'figure_pool_workers': figure_pool_workers, 'states': n_states, 'cities_per_state': cities_per_state,
+                       'repeats': repeats, 'memory_samples': memory_samples},
+        'scales': results,
+    }
+
+
+def print_scale(scale, result):
+    print(f"\n{scale} ({result['backend']}): {result['rows']} rows, startup {result['startup_s']} s, max RSS {result['max_rss_mb']} MB")
+    print(f"{'callback':<24}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak MB':>10}{'payload KB':>12}")
+    for name, stats in result['callbacks'].items():
+        latency = stats['latency_ms']
+        print(f"{name:<24}{latency['p50']:>10.1f}{latency['p90']:>10.1f}{latency['p99']:>10.1f}"
+              f"{stats['peak_memory_mb']:>10.1f}{stats['payload_bytes']['mean'] / 1024:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard callbacks on synthetic data")
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help="comma separated row counts, e.g. 100k,1M,10M")
+    parser.add_argument('--backend', choices=['pandas', 'duckdb'], default='pandas', help="QUERY_BACKEND of the app")
+    parser.add_argument('--figure-pool-workers', type=int, default=0, help="FIGURE_POOL_WORKERS of the app")
+    parser.add_argument('--states', type=int, default=24)
+    parser.add_argument('--cities-per-state', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--memory-samples', type=int, default=3)
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, 'benchmarks', 'data'))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.backend, args.figure_pool_workers, args.repeats, args.memory_samples, args.result)
+        return
+
+    results = run(args.scales.split(','), args.backend, args.figure_pool_workers, args.states, args.cities_per_state,
+                  args.repeats, args.memory_samples, args.data_dir)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# (State, Time_zone) pairs used first; further states get generated names
+STATES = [
+    ('Arizona', 'Mountain Time Zone'), ('Colorado', 'Mountain Time Zone'), ('Utah', 'Mountain Time Zone'),
+    ('New Mexico', 'Mountain Time Zone'), ('Idaho', 'Mountain Time Zone'), ('Wyoming', 'Mountain Time Zone'),
+    ('California', 'Pacific Time Zone'), ('Oregon', 'Pacific Time Zone'), ('Washington', 'Pacific Time Zone'),
+    ('Nevada', 'Pacific Time Zone'), ('Texas', 'Central Time Zone'), ('Illinois', 'Central Time Zone'),
+    ('Missouri', 'Central Time Zone'), ('Oklahoma', 'Central Time Zone'), ('Iowa', 'Central Time Zone'),
+    ('Louisiana', 'Central Time Zone'), ('New York', 'Eastern Time Zone'), ('Pennsylvania', 'Eastern Time Zone'),
+    ('Ohio', 'Eastern Time Zone'), ('Florida', 'Eastern Time Zone'), ('Georgia', 'Eastern Time Zone'),
+    ('Virginia', 'Eastern Time Zone'), ('Alaska', 'Alaska Time Zone'), ('Hawaii', 'Hawaii-Aleutian Time Zone'),
+]
+TIME_ZONES = sorted({zone for _, zone in STATES})
+GASES = ['O3', 'CO', 'SO2', 'NO2']
+GAS_SCALE = {'O3': 0.03, 'CO': 0.3, 'SO2': 1.5, 'NO2': 12.0}
+
+
+def state_list(n_states):
+    states = STATES[:n_states]
+    for i in range(len(states), n_states):
+        states.append((f"State {i:03d}", TIME_ZONES[i % len(TIME_ZONES)]))
+    return states
+
+
+def generate(rows, n_states=24, cities_per_state=8, start='2010-01-01', end='2023-12-31', seed=0):
+    # Same columns and value ranges as pollution_2010_2023.csv: one row per site and day,
+    # with a yearly cycle, per-site offsets and a few missing values
+    rng = np.random.default_rng(seed)
+    states = state_list(n_states)
+    dates = pd.date_range(start, end, freq='D')
+
+    site_state = np.repeat(np.arange(len(states)), cities_per_state)
+    n_sites = len(site_state)
+
+    site = rng.integers(0, n_sites, rows)
+    day = rng.integers(0, len(dates), rows)
+    order = np.lexsort((site, day))
+    site, day = site[order], day[order]
+
+    state_names = np.array([name for name, _ in states], dtype=object)
+    zone_names = np.array([zone for _, zone in states], dtype=object)
+    city_names = np.array([f"{states[s][0]} City {i % cities_per_state}" for i, s in enumerate(site_state)], dtype=object)
+
+    season = np.cos(2 * np.pi * dates.dayofyear.to_numpy()[day] / 365.25)
+    site_offset = rng.normal(1.0, 0.15, n_sites)[site]
+
+    frame = {
+        'Date': dates.strftime('%Y-%m-%d').to_numpy()[day],
+        'Address': np.char.add('Site ', site.astype(str)),
+        'State': state_names[site_state[site]],
+        'County': np.char.add('County ', (site // 2).astype(str)),
+        'City': city_names[site],
+    }
+    for g, gas in enumerate(GASES):
+        phase = 1 if gas == 'O3' else -1
+        mean = GAS_SCALE[gas] * site_offset * (1 + 0.35 * phase * season) * rng.lognormal(0, 0.25, rows)
+        hours = np.clip(np.round(rng.normal(13 if gas == 'O3' else 7, 3.5, rows)), 0, 23)
+        aqi = np.clip(np.round(mean / GAS_SCALE[gas] * 35 + rng.normal(0, 5, rows)), 0, 300)
+
+        frame[f"{gas} Mean"] = mean.round(6)
+        frame[f"{gas} 1st Max Value"] = (mean * rng.uniform(1.1, 1.8, rows)).round(3)
+        frame[f"{gas} 1st Max Hour"] = hours.astype(np.int64)
+        frame[f"{gas} AQI"] = aqi
+
+        missing = rng.random(rows) < 0.01
+        frame[f"{gas} AQI"][missing] = np.nan
+
+    frame['Time_zone'] = zone_names[site_state[site]]
+    return pd.DataFrame(frame)
+
+
+def write_csv(path, rows, chunk_rows=1_000_000, **kwargs):
+    # Large scales are generated and written in chunks to bound memory
+    tmp_path = f"{path}.tmp"
+    written = 0
+    seed = kwargs.pop('seed', 0)
+    with open(tmp_path, 'w', newline='') as file:
+        while written < rows:
+            chunk = min(chunk_rows, rows - written)
+            generate(chunk, seed=seed + written, **kwargs).to_csv(file, index=False, header=written == 0)
+            written += chunk
+    os.replace(tmp_path, path)
+    return path
+
+
+def dataset_path(data_dir, rows, n_states, cities_per_state, seed=0):
+    # Reuses a dataset generated earlier with the same parameters
+    path = os.path.join(data_dir, f"pollution_{rows}_{n_states}s_{cities_per_state}c_{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        write_csv(path, rows, n_states=n_states, cities_per_state=cities_per_state, seed=seed)
+    return path
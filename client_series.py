@@ -0,0 +1,34 @@
+import numpy as np
+import plotly.io as pio
+
+from figures import typed_array
+
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def day_numbers(dates):
+    # Days since 1970-01-01, enough to rebuild any calendar date in the browser
+    return (dates.to_numpy(dtype='datetime64[D]') - EPOCH).astype(np.int32)
+
+
+def base_layout(**layout):
+    # The browser builds figures without plotly.py, so the shared template travels with the data
+    template = pio.templates[pio.templates.default].layout.to_plotly_json()
+    return dict({'template': {'layout': template}}, **layout)
+
+
+def grouped_series(frame, by, columns, webgl_threshold, layout, dtype='f4'):
+    # Columnar store for the clientside callbacks: rows sorted by (`by`, Date), one contiguous block per group
+    # whose bounds are in `offsets`, so a date range is two binary searches per group in the browser
+    frame = frame.sort_values([by, 'Date'])
+    keys = frame[by].astype(str).to_numpy()
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+    return {
+        'groups': keys[starts].tolist(),
+        'offsets': starts.tolist() + [len(frame)],
+        'dates': typed_array(day_numbers(frame['Date']), 'i4'),
+        'columns': {column: typed_array(frame[column].to_numpy(), dtype) for column in columns},
+        'webgl_threshold': webgl_threshold,
+        'layout': layout,
+    }
@@ -0,0 +1,69 @@
+import os
+
+
+def _env_flag(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Raw dataset and the columnar cache built from it
+DATASET_PATH = os.environ.get('DATASET_PATH', './datasets/pollution_2010_2023.csv')
+DATASET_CACHE_PATH = os.environ.get('DATASET_CACHE_PATH', './datasets/pollution_2010_2023.arrow')
+
+# Memoized callback outputs; leave FIGURE_CACHE_DIR empty to keep the cache in memory only
+FIGURE_CACHE_ENTRIES = int(os.environ.get('FIGURE_CACHE_ENTRIES', 256))
+FIGURE_CACHE_MB = int(os.environ.get('FIGURE_CACHE_MB', 64))
+FIGURE_CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', './cache/figures')
+FIGURE_CACHE_DISK_MB = int(os.environ.get('FIGURE_CACHE_DISK_MB', 512))
+FIGURE_CACHE_PREWARM = _env_flag('FIGURE_CACHE_PREWARM', True)
+FIGURE_CACHE_PREWARM_BACKGROUND = _env_flag('FIGURE_CACHE_PREWARM_BACKGROUND', True)
+
+# Level of detail for long time series: points kept per trace and the size at which traces switch to WebGL
+PLOT_WIDTH_PX = int(os.environ.get('PLOT_WIDTH_PX', 1200))
+WEBGL_POINT_THRESHOLD = int(os.environ.get('WEBGL_POINT_THRESHOLD', 2000))
+
+# Tab-2 outlier removal: one set of IQR bounds per state (default) or per city
+OUTLIER_BOUNDS_PER_CITY = _env_flag('OUTLIER_BOUNDS_PER_CITY', False)
+
+# `python app.py` development server
+DEBUG = _env_flag('DASH_DEBUG', True)
+
+# `python serve.py` production server
+SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:8050')
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', os.cpu_count() or 1))
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 120))
+SERVER_PRELOAD = _env_flag('SERVER_PRELOAD', True)
+
+# Run the heavy date/hover callbacks as Dash background callbacks (needs diskcache and multiprocess)
+BACKGROUND_CALLBACKS = _env_flag('BACKGROUND_CALLBACKS', False)
+BACKGROUND_CACHE_DIR = os.environ.get('BACKGROUND_CACHE_DIR', './cache/background')
+CALLBACK_DEBOUNCE_SECONDS = float(os.environ.get('CALLBACK_DEBOUNCE_SECONDS', 0.3))
+
+# Drop directory for new CSV/Parquet batches, folded in while the app runs (disabled when empty)
+INGEST_DIR = os.environ.get('INGEST_DIR', '')
+INGEST_POLL_SECONDS = float(os.environ.get('INGEST_POLL_SECONDS', 5))
+INGEST_AUTOSTART = _env_flag('INGEST_AUTOSTART', True)
+
+# Send tab contents on first selection instead of with the page, and log a per-phase startup timing report
+LAZY_TABS = _env_flag('LAZY_TABS', True)
+STARTUP_PROFILE = _env_flag('STARTUP_PROFILE', False)
+
+# Callback timings and counters are served at /metrics; calls slower than this many seconds are logged (0 disables)
+SLOW_CALLBACK_SECONDS = float(os.environ.get('SLOW_CALLBACK_SECONDS', 0))
+
+# Send tab 1 and tab 3 series to the browser once per selection and slice date ranges there (assets/clientside.js)
+CLIENTSIDE_DATES = _env_flag('CLIENTSIDE_DATES', False)
+
+# Where the callbacks' filter + group-by steps run: 'pandas' keeps the rollup in memory, 'duckdb' queries
+# a Parquet copy of it partitioned by time zone and year, so the raw dataset is never loaded (needs duckdb)
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'pandas').strip().lower()
+PARQUET_DIR = os.environ.get('PARQUET_DIR', './datasets/parquet')
+DUCKDB_MEMORY_LIMIT = os.environ.get('DUCKDB_MEMORY_LIMIT', '')
+
+# Build the independent figures of one callback concurrently on a shared pool of this many threads (0 disables);
+# a callback whose figure is still building after the timeout leaves its outputs unchanged
+FIGURE_POOL_WORKERS = int(os.environ.get('FIGURE_POOL_WORKERS', 0))
+FIGURE_POOL_TIMEOUT_SECONDS = float(os.environ.get('FIGURE_POOL_TIMEOUT_SECONDS', 2))
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+
+CATEGORICAL_COLUMNS = ['State', 'City', 'Time_zone']
+
+# Bump whenever compact_frame or the stored metadata change so existing caches get rebuilt
+CACHE_VERSION = 2
+SIGNATURE_KEY = b'csv_signature'
+METADATA_KEY = b'dataset_metadata'
+
+
+def compact_frame(frame):
+    # Categorical codes for the text columns, real datetimes, 32-bit (or smaller) numbers
+    frame = frame.copy()
+    frame['Date'] = pd.to_datetime(frame['Date'])
+
+    for column in frame.columns:
+        series = frame[column]
+        if column == 'Date':
+            continue
+        if column in CATEGORICAL_COLUMNS or pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            frame[column] = series.astype('category')
+        elif pd.api.types.is_float_dtype(series):
+            frame[column] = series.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(series):
+            frame[column] = pd.to_numeric(series, downcast='integer')
+
+    return frame
+
+
+def dataset_metadata(frame):
+    # What the layout needs (dropdown options, date picker bounds) without scanning the frame again
+    return {
+        'states': [str(state) for state in frame['State'].dropna().unique().tolist()],
+        'time_zones': [str(zone) for zone in frame['Time_zone'].dropna().unique().tolist()],
+        'min_date': frame['Date'].min().strftime('%Y-%m-%d'),
+        'max_date': frame['Date'].max().strftime('%Y-%m-%d'),
+    }
+
+
+def concat_frames(frames):
+    # pd.concat falls back to object dtype when categories differ; union them first
+    frames = [frame for frame in frames if frame is not None]
+    for column in frames[0].columns:
+        if any(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames):
+            categories = pd.Index([])
+            for frame in frames:
+                values = frame[column]
+                values = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else pd.Index(values.dropna().unique())
+                categories = categories.union(values)
+            frames = [frame.assign(**{column: pd.Categorical(frame[column], categories=categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _csv_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'version': CACHE_VERSION}
+
+
+def dataset_fingerprint(csv_path, cache_path=None):
+    # Short id of the dataset contents, used to namespace anything persisted from it
+    path = csv_path if os.path.exists(csv_path) or not cache_path else cache_path
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{CACHE_VERSION}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _read_schema_metadata(cache_path, key):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with pa.memory_map(cache_path, 'r') as source:
+            metadata = ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if key not in metadata:
+        return None
+    return json.loads(metadata[key])
+
+
+def _read_signature(cache_path):
+    return _read_schema_metadata(cache_path, SIGNATURE_KEY)
+
+
+def load_metadata(cache_path, frame):
+    # Written into the cache when it is built; only computed from the frame when there is no cache
+    metadata = _read_schema_metadata(cache_path, METADATA_KEY) if pa is not None and cache_path else None
+    return metadata or dataset_metadata(frame)
+
+
+def _to_arrow(frame, signature):
+    arrays = []
+    for column in frame.columns:
+        series = frame[column]
+        if isinstance(series.dtype, pd.CategoricalDtype) or column == 'Date':
+            arrays.append(pa.array(series, from_pandas=True))
+        else:
+            # Keep NaN as a value instead of a null so the column maps back without a copy
+            arrays.append(pa.array(series.to_numpy(), from_pandas=False))
+
+    table = pa.Table.from_arrays(arrays, names=list(frame.columns))
+    return table.replace_schema_metadata({
+        SIGNATURE_KEY: json.dumps(signature),
+        METADATA_KEY: json.dumps(dataset_metadata(frame)),
+    })
+
+
+def write_cache(frame, cache_path, signature):
+    table = _to_arrow(frame, signature)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with ipc.new_file(tmp_path, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, cache_path)
+
+
+def read_cache(cache_path):
+    # Memory-mapped: numeric buffers are served straight from the page cache
+    source = pa.memory_map(cache_path, 'r')
+    table = ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def load_dataset(csv_path, cache_path=None):
+    if pa is None or not cache_path:
+        return compact_frame(pd.read_csv(csv_path))
+
+    if not os.path.exists(csv_path):
+        # Deployments may ship only the prebuilt cache
+        return read_cache(cache_path)
+
+    signature = _csv_signature(csv_path)
+    if _read_signature(cache_path) != signature:
+        write_cache(compact_frame(pd.read_csv(csv_path)), cache_path, signature)
+
+    return read_cache(cache_path)
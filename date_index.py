@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+
+def date_bounds(dates, start=None, end=None, lo=0, hi=None):
+    # Positions of the [start, end] range inside the date-sorted dates[lo:hi], inclusive on both ends
+    # like the date pickers
+    hi = len(dates) if hi is None else hi
+    if start is not None:
+        lo += int(np.searchsorted(dates[lo:hi], _as_key(dates, start), side='left'))
+    if end is not None:
+        hi = lo + int(np.searchsorted(dates[lo:hi], _as_key(dates, end), side='right'))
+    return lo, hi
+
+
+def _as_key(dates, value):
+    return pd.Timestamp(value).to_datetime64().astype(dates.dtype)
+
+
+class DateRangeIndex:
+    # Rows sorted by (key, Date): every key owns one contiguous block and a date range inside
+    # that block is two binary searches plus a positional slice, with no boolean mask over the table
+
+    def __init__(self, frame, key):
+        self.key = key
+        self.frame = frame.sort_values([key, 'Date'], kind='stable').reset_index(drop=True)
+        self.dates = self.frame['Date'].to_numpy()
+
+        keys = self.frame[key].to_numpy()
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(keys)]
+        self.blocks = {keys[start]: (start, stop) for start, stop in zip(starts, stops)}
+
+    def bounds(self, key_value, start=None, end=None):
+        lo, hi = self.blocks.get(key_value, (0, 0))
+        return date_bounds(self.dates, start, end, lo, hi)
+
+    def slice(self, key_value, start=None, end=None):
+        # Inclusive on both ends, like the date pickers
+        lo, hi = self.bounds(key_value, start, end)
+        return self.frame.iloc[lo:hi]
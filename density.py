@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from rollups import GASES
+
+
+HOURS = np.arange(24)
+KDE_GRID = np.linspace(0, 23, 231)
+
+
+class HourHistograms:
+    # Counts of `{gas} 1st Max Hour` per (State, City), 24 bins each: shape (cities, gases, 24)
+
+    def __init__(self, frame=None, gases=GASES):
+        self.gases = list(gases)
+        self.keys = []
+        self.rows = {}
+        self.cities = {}
+        self.counts = np.zeros((0, len(self.gases), 24), dtype=np.int64)
+        if frame is not None:
+            self.add(frame)
+
+    @classmethod
+    def from_counts(cls, counts, gases=GASES):
+        # Built from a long (State, City, Gas, Hour, Count) frame counted elsewhere, e.g. by DuckDB
+        histograms = cls(gases=gases)
+        keys, rows, cities, table = histograms._extended(
+            sorted({(str(state), str(city)) for state, city in zip(counts['State'], counts['City'])}))
+
+        row_ids = np.array([rows[(str(state), str(city))] for state, city in zip(counts['State'], counts['City'])],
+                           dtype=np.int64)
+        gas_ids = counts['Gas'].map({gas: g for g, gas in enumerate(histograms.gases)}).to_numpy()
+        known = ~pd.isna(gas_ids)
+        np.add.at(table,
+                  (row_ids[known], gas_ids[known].astype(np.int64), counts['Hour'].to_numpy()[known].astype(np.int64)),
+                  counts['Count'].to_numpy()[known].astype(np.int64))
+        histograms._publish(keys, rows, cities, table)
+        return histograms
+
+    def _extended(self, keys):
+        # Copies of keys, rows, cities and counts with new (State, City) pairs appended; per-state city
+        # lists stay sorted. Nothing a reader holds is modified
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self.rows]
+        all_keys = self.keys + new_keys
+        rows = dict(self.rows)
+        for key in new_keys:
+            rows[key] = len(rows)
+        cities = dict(self.cities)
+        for state in {key[0] for key in new_keys}:
+            cities[state] = sorted(cities.get(state, []) + [city for key_state, city in new_keys if key_state == state])
+        counts = np.concatenate([self.counts, np.zeros((len(new_keys), len(self.gases), 24), dtype=np.int64)])
+        return all_keys, rows, cities, counts
+
+    def _publish(self, keys, rows, cities, counts):
+        # Readers look up cities, then rows, then counts. Swapping them in the reverse order means every
+        # city a reader sees already has a row, and every row already has its counts
+        self.counts = counts
+        self.rows = rows
+        self.keys = keys
+        self.cities = cities
+
+    def add(self, frame):
+        # Accumulate a batch of raw rows into new arrays, then swap them in
+        grouped = frame.groupby(['State', 'City'], observed=True, sort=True)
+        batch_keys = [(str(state), str(city)) for state, city in grouped.size().index]
+        if not batch_keys:
+            return
+        keys, rows, cities, counts = self._extended(batch_keys)
+
+        batch_rows = np.array([rows[key] for key in batch_keys], dtype=np.int64)
+        group_ids = grouped.ngroup().to_numpy()
+        # Rows with a missing State/City belong to no group (-1)
+        row_ids = np.where(group_ids >= 0, batch_rows[group_ids], -1)
+
+        for g, gas in enumerate(self.gases):
+            hours = frame[f"{gas} 1st Max Hour"].to_numpy(dtype=np.float64)
+            valid = (row_ids >= 0) & np.isfinite(hours) & (hours >= 0) & (hours <= 23)
+            bins = row_ids[valid] * 24 + hours[valid].astype(np.int64)
+            counts[:, g, :] += np.bincount(bins, minlength=len(keys) * 24).reshape(-1, 24)
+        self._publish(keys, rows, cities, counts)
+
+    def state(self, state, gas):
+        # (cities in groupby order, counts of shape (cities, 24)) for one gas
+        cities = self.cities.get(state, [])
+        rows = self.rows
+        counts = self.counts
+        return cities, counts[[rows[(state, city)] for city in cities], self.gases.index(gas), :]
+
+    def city(self, state, city):
+        row = self.rows[(state, city)]
+        counts = self.counts[row]
+        return {gas: counts[g] for g, gas in enumerate(self.gases)}
+
+
+def binned_kde(counts, grid=KDE_GRID):
+    # Gaussian KDE with Scott's bandwidth (scipy's default) evaluated straight from the hour bins.
+    # The samples are whole hours, so this equals the KDE over the raw values.
+    counts = np.atleast_2d(counts).astype(np.float64)
+    n = counts.sum(axis=1, keepdims=True)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (counts * HOURS).sum(axis=1, keepdims=True) / n
+        variance = (counts * (HOURS - mean) ** 2).sum(axis=1, keepdims=True) / (n - 1)
+        bandwidth = np.sqrt(variance) * n ** (-1 / 5)
+    # A single distinct hour has no spread; fall back to half an hour so the curve stays visible
+    bandwidth = np.where(np.isfinite(bandwidth) & (bandwidth > 0), bandwidth, 0.5)
+
+    offsets = (grid[None, :, None] - HOURS[None, None, :]) / bandwidth[:, :, None]
+    kernel = np.exp(-0.5 * offsets ** 2) / (bandwidth[:, :, None] * np.sqrt(2 * np.pi))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        density = (kernel * counts[:, None, :]).sum(axis=2) / n
+    return np.nan_to_num(density)
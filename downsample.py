@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, for every bucket in
+    # between, the point spanning the largest triangle with the previous pick and the next bucket mean
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo = hi
+        next_hi = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_lo:next_hi].mean()
+        next_y = y[next_lo:next_hi].mean()
+
+        area = np.abs((x[previous] - next_x) * (y[lo:hi] - y[previous])
+                      - (x[previous] - x[lo:hi]) * (next_y - y[previous]))
+        previous = lo + int(area.argmax())
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def downsample_frame(frame, x, y, n_out, by=None):
+    # LTTB per group (one group per plotted trace); groups that already fit are left untouched
+    if by is None:
+        groups = [frame]
+    else:
+        groups = [group for _, group in frame.groupby(by, observed=True, sort=False)]
+
+    parts = []
+    for group in groups:
+        if len(group) > n_out:
+            group = group[group[y].notna()]
+            x_values = group[x]
+            if pd.api.types.is_datetime64_any_dtype(x_values):
+                x_values = x_values.astype('int64')
+            group = group.iloc[lttb_indices(x_values.to_numpy(), group[y].to_numpy(), n_out)]
+        parts.append(group)
+
+    if not parts:
+        return frame
+    return pd.concat(parts) if len(parts) > 1 else parts[0]
+
+
+def visible_window(relayout_data, start, end):
+    # Date window currently shown by a graph, clamped to the picker range.
+    # Returns None when the relayout event did not touch the x axis.
+    if not relayout_data:
+        return None
+    if relayout_data.get('xaxis.autorange'):
+        return start, end
+
+    if 'xaxis.range' in relayout_data:
+        low, high = relayout_data['xaxis.range']
+    elif 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        low, high = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    else:
+        return None
+
+    # One extra day on each side keeps the line running off the edges of the plot
+    low = max(pd.Timestamp(low).normalize() - pd.Timedelta(days=1), pd.Timestamp(start))
+    high = min(pd.Timestamp(high).normalize() + pd.Timedelta(days=1), pd.Timestamp(end))
+    if low > high:
+        return start, end
+    return low.strftime('%Y-%m-%d'), high.strftime('%Y-%m-%d')
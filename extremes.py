@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from date_index import date_bounds
+
+
+class RangeMinimum:
+    # Minimum of any range of an integer array: a sparse table over the minima of fixed-size blocks plus
+    # numpy scans of the partial blocks at both ends. Memory stays close to the array itself and a query
+    # touches two table entries and at most two blocks.
+
+    def __init__(self, values, block=64):
+        self.values = np.asarray(values)
+        self.block = block
+        n_blocks = -(-len(self.values) // block)
+        padded = np.full(n_blocks * block, np.iinfo(self.values.dtype).max, dtype=self.values.dtype)
+        padded[:len(self.values)] = self.values
+        # table[k][i] is the minimum of blocks i .. i + 2**k - 1
+        self.table = [padded.reshape(n_blocks, block).min(axis=1)]
+        while 1 << len(self.table) <= n_blocks:
+            previous, half = self.table[-1], 1 << (len(self.table) - 1)
+            self.table.append(np.minimum(previous[:-half], previous[half:]))
+
+    def query(self, lo, hi):
+        # Minimum of values[lo:hi], for lo < hi
+        lo, hi = int(lo), int(hi)
+        first, last = -(-lo // self.block), hi // self.block
+        if first >= last:
+            return self.values[lo:hi].min()
+
+        level = (last - first).bit_length() - 1
+        best = min(self.table[level][first], self.table[level][last - (1 << level)])
+        if lo < first * self.block:
+            best = min(best, self.values[lo:first * self.block].min())
+        if last * self.block < hi:
+            best = min(best, self.values[last * self.block:hi].min())
+        return best
+
+
+class DailyExtremes:
+    # Per-(Date, State) values of one time zone and gas in date order, so any date range is one contiguous
+    # run. Max and min come from range-minimum queries over precomputed ranks, sum and count from prefix sums.
+
+    def __init__(self, frame, column):
+        frame = frame.sort_values(['Date', 'State'], kind='stable')
+        self.dates = frame['Date'].to_numpy()
+        self.values = frame[column].to_numpy(dtype=np.float64)
+        self.state_codes, self.state_names = pd.factorize(frame['State'].astype(str).to_numpy(), sort=True)
+
+        # Ties go to the first state, then the first date, as in a scan of the (State, Date) ordered frame;
+        # missing values rank last
+        position = np.arange(len(self.values))
+        missing = np.isnan(self.values)
+        self.max_order = np.lexsort((position, self.state_codes, -self.values, missing))
+        self.min_order = np.lexsort((position, self.state_codes, self.values, missing))
+        self.max_ranks = RangeMinimum(_inverse(self.max_order))
+        self.min_ranks = RangeMinimum(_inverse(self.min_order))
+
+        self.sums = np.r_[0.0, np.cumsum(np.where(missing, 0.0, self.values))]
+        self.counts = np.r_[0, np.cumsum(~missing)]
+
+    def summary(self, start, end):
+        # Highest and lowest (state, date, value), mean and median of the range; None when it holds no values
+        lo, hi = date_bounds(self.dates, start, end)
+        if lo >= hi or self.counts[hi] == self.counts[lo]:
+            return None
+
+        top = self.max_order[self.max_ranks.query(lo, hi)]
+        bottom = self.min_order[self.min_ranks.query(lo, hi)]
+        return {
+            'max': self._point(top),
+            'min': self._point(bottom),
+            'mean': (self.sums[hi] - self.sums[lo]) / (self.counts[hi] - self.counts[lo]),
+            # Selection rather than a sort, over a view of the range
+            'median': float(np.nanmedian(self.values[lo:hi])),
+        }
+
+    def _point(self, row):
+        return self.state_names[self.state_codes[row]], pd.Timestamp(self.dates[row]), self.values[row]
+
+
+def _inverse(order):
+    # Rank of every row in `order`, kept small so the range-minimum tables are too
+    ranks = np.empty(len(order), dtype=np.int32)
+    ranks[order] = np.arange(len(order), dtype=np.int32)
+    return ranks
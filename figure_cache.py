@@ -0,0 +1,298 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from functools import wraps
+from importlib import metadata
+
+import plotly.graph_objects as go
+
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the disk entry layout changes
+CACHE_VERSION = 2
+# Share of the disk budget kept after an eviction pass, so passes do not run on every write
+DISK_EVICTION_TARGET = 0.8
+
+
+def _plain(value):
+    # Figures are stored as plain dicts: cheap to pickle and to hand back to Dash
+    if isinstance(value, go.Figure):
+        return value.to_plotly_json()
+    if isinstance(value, tuple):
+        return tuple(_plain(item) for item in value)
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+def code_fingerprint(directory, packages=('dash', 'plotly')):
+    # Short id of the Python sources in `directory` and the versions of the figure libraries, so a
+    # deploy never serves figures built by the previous code
+    digest = hashlib.sha1(str(CACHE_VERSION).encode('utf-8'))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as file:
+                digest.update(name.encode('utf-8') + b'\0' + file.read())
+    for package in packages:
+        try:
+            digest.update(f"{package}=={metadata.version(package)}".encode('utf-8'))
+        except metadata.PackageNotFoundError:
+            pass
+    return digest.hexdigest()[:16]
+
+
+class FigureCache:
+    # In-memory LRU bounded by entry count and pickled size, with an optional on-disk tier bounded by size.
+    # The disk budget covers every namespace under `disk_dir`, so those of older datasets and code age out
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, disk_dir=None, namespace='',
+                 max_disk_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_root = disk_dir
+        self.disk_dir = os.path.join(disk_dir, namespace) if disk_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        # Running estimate of the bytes under disk_root; other workers write there too, so it is
+        # corrected by every eviction pass
+        self.disk_size = 0
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        # Held from the generation check of put() to the end of its disk write, and by invalidate() while it
+        # moves to the next generation, so a write either lands before the invalidation scan or not at all
+        self.write_lock = threading.Lock()
+        self.generation = 0
+        # Disk entries are tagged with the ingested batches they were computed from. Workers sharing the
+        # disk tier apply batches at different times; an entry from a worker that is behind is never served
+        self.batches = set()
+        self.data_version = ''
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'disk_hits': 0, 'disk_evictions': 0,
+                         'invalidations': 0}
+        # function name -> affected_by(key_args, change) predicate registered by memoize()
+        self.dependencies = {}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._evict_disk()
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def _remember(self, key, payload):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        if len(payload) > self.max_bytes:
+            return
+        self.entries[key] = payload
+        self.size += len(payload)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.counters['evictions'] += 1
+
+    def _read_disk(self, path, key_only=False):
+        # Disk entries are the pickled (key, data version) followed by the pickled value
+        try:
+            with open(path, 'rb') as file:
+                stored_key, version = pickle.load(file)
+                return stored_key, version, None if key_only else file.read()
+        except (OSError, pickle.UnpicklingError, EOFError, TypeError, ValueError):
+            return None, None, None
+
+    def _write_disk(self, path, key, version, payload):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as file:
+                pickle.dump((key, version), file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning("Could not write figure cache entry %s", path)
+            return
+        with self.lock:
+            self.disk_size += len(payload)
+            over = self.disk_size > self.max_disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _disk_entries(self):
+        # (modification time, size, path) of every entry under disk_root, in all namespaces
+        entries = []
+        for namespace in os.scandir(self.disk_root):
+            if not namespace.is_dir():
+                continue
+            for entry in os.scandir(namespace.path):
+                if entry.name.endswith('.pkl'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict_disk(self):
+        # Removes the least recently used disk entries until the tier is back under its budget;
+        # get() touches the entries it reads
+        try:
+            entries = sorted(self._disk_entries())
+        except OSError:
+            logger.warning("Could not scan figure cache directory %s", self.disk_root)
+            return
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > self.max_disk_bytes:
+            target = self.max_disk_bytes * DISK_EVICTION_TARGET
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            for namespace in os.scandir(self.disk_root):
+                if namespace.is_dir() and namespace.path != self.disk_dir:
+                    try:
+                        os.rmdir(namespace.path)
+                    except OSError:
+                        pass
+        with self.lock:
+            self.disk_size = total
+            self.counters['disk_evictions'] += removed
+
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return True, pickle.loads(payload)
+
+        if self.disk_dir:
+            stored_key, version, payload = self._read_disk(self._disk_path(key))
+            if stored_key == key and version == self.data_version:
+                try:
+                    os.utime(self._disk_path(key))
+                except OSError:
+                    pass
+                with self.lock:
+                    self._remember(key, payload)
+                    self.counters['hits'] += 1
+                    self.counters['disk_hits'] += 1
+                return True, pickle.loads(payload)
+
+        with self.lock:
+            self.counters['misses'] += 1
+        return False, None
+
+    def put(self, key, value, generation=None):
+        # `generation` is self.generation from before `value` was computed; an invalidate() since then
+        # may have applied data the value does not include, so it is dropped
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.write_lock:
+            if generation is not None and generation != self.generation:
+                return False
+            with self.lock:
+                self._remember(key, payload)
+            if self.disk_dir:
+                self._write_disk(self._disk_path(key), key, self.data_version, payload)
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def invalidate(self, change, source=None):
+        # Drop the entries whose inputs overlap `change`; functions without a predicate lose everything.
+        # `source` names the ingested batch, the same in every worker sharing the disk tier
+        def stale(key):
+            affected_by = self.dependencies.get(key[0])
+            return affected_by is None or affected_by(key[1:], change)
+
+        with self.write_lock:
+            self.generation += 1
+            previous = self.data_version
+            if source is not None:
+                self.batches.add(str(source))
+                self.data_version = hashlib.sha1('\n'.join(sorted(self.batches)).encode('utf-8')).hexdigest()
+
+        removed = 0
+        with self.lock:
+            for key in [key for key in self.entries if stale(key)]:
+                self.size -= len(self.entries.pop(key))
+                removed += 1
+
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if not name.endswith('.pkl'):
+                    continue
+                path = os.path.join(self.disk_dir, name)
+                stored_key, version, _ = self._read_disk(path, key_only=True)
+                if version == self.data_version:
+                    # Already written or carried over by a worker that applied this batch first
+                    continue
+                if stored_key is None or stale(stored_key):
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except OSError:
+                        pass
+                elif version == previous:
+                    # Untouched by the batch: carry it over to the new data version
+                    _, _, payload = self._read_disk(path)
+                    if payload is not None:
+                        self._write_disk(path, stored_key, self.data_version, payload)
+
+        with self.lock:
+            self.counters['invalidations'] += removed
+        return removed
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, entries=len(self.entries), bytes=self.size)
+
+    def memoize(self, key=None, affected_by=None):
+        # `key` maps the callback arguments to the parts that actually change the output,
+        # `affected_by(key_args, change)` tells invalidate() whether new data touches an entry
+        def decorator(func):
+            self.dependencies[func.__name__] = affected_by
+
+            @wraps(func)
+            def wrapper(*args):
+                cache_key = (func.__name__,) + tuple(key(*args) if key else args)
+                found, value = self.get(cache_key)
+                if found:
+                    return value
+                generation = self.generation
+                value = _plain(func(*args))
+                self.put(cache_key, value, generation)
+                return value
+            return wrapper
+        return decorator
+
+    def prewarm(self, calls, background=True):
+        # calls: (memoized function, args) pairs, usually the default selection of every tab
+        def run():
+            for func, args in calls:
+                try:
+                    func(*args)
+                except Exception:
+                    logger.exception("Pre-warming %s%r failed", func.__name__, args)
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name='figure-cache-prewarm', daemon=True)
+        thread.start()
+        return thread
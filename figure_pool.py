@@ -0,0 +1,64 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from dash.exceptions import PreventUpdate
+
+
+logger = logging.getLogger(__name__)
+
+
+class FigurePool:
+    # Builds the independent figures of one callback side by side on a pool shared by every callback.
+    # The calling thread builds the first figure itself, then takes back any figure no pool thread has
+    # started yet, so a busy pool degrades to the sequential build instead of queueing requests behind
+    # each other. A figure already running on the pool is not built again, since that would only add
+    # work to a slow moment; one still running after `timeout` seconds is reported to `on_timeout` and
+    # the callback is abandoned with PreventUpdate, leaving its outputs as they were. The pool thread
+    # finishes the figure on its own and its result is dropped.
+
+    def __init__(self, workers=0, timeout=2.0, on_fallback=None, on_timeout=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.on_fallback = on_fallback
+        self.on_timeout = on_timeout
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def _executor(self):
+        # Created lazily per process: pool threads started in a preloading gunicorn master do not
+        # survive the fork into the workers
+        pid = os.getpid()
+        with self.lock:
+            if self.executor is None or self.executor[0] != pid:
+                self.executor = (pid, ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='figure-pool'))
+        return self.executor[1]
+
+    def _fallback(self, task):
+        if self.on_fallback:
+            self.on_fallback()
+        return task()
+
+    def build(self, *tasks):
+        # Results of the zero-argument `tasks`, in order; exceptions propagate as if run in sequence.
+        # Memoized callers cache nothing when a timeout raises PreventUpdate
+        if self.workers <= 0 or len(tasks) < 2:
+            return [task() for task in tasks]
+
+        executor = self._executor()
+        futures = [executor.submit(task) for task in tasks[1:]]
+        results = [tasks[0]()]
+        for task, future in zip(tasks[1:], futures):
+            if future.cancel():
+                results.append(self._fallback(task))
+                continue
+            try:
+                results.append(future.result(timeout=self.timeout))
+            except TimeoutError:
+                logger.warning("Figure pool task %r still running after %ss; the callback is not updated",
+                               getattr(task, '__name__', task), self.timeout)
+                if self.on_timeout:
+                    self.on_timeout()
+                raise PreventUpdate from None
+        return results
@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from data_loader import compact_frame
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SUFFIXES = ('.csv', '.parquet')
+
+
+def read_batch(path):
+    if path.endswith('.parquet'):
+        frame = pd.read_parquet(path)
+    else:
+        frame = pd.read_csv(path)
+    frame = compact_frame(frame)
+    # Names the batch in FigureCache.invalidate(); every worker reads the same drop directory
+    frame.attrs['source'] = os.path.basename(path)
+    return frame
+
+
+def describe_batch(batch):
+    # What a batch touches, as handed to FigureCache.invalidate()
+    return {
+        'time_zones': set(batch['Time_zone'].dropna().astype(str)),
+        'states': set(batch['State'].dropna().astype(str)),
+        'start': batch['Date'].min(),
+        'end': batch['Date'].max(),
+    }
+
+
+def overlaps_dates(change, start, end):
+    # Whether [start, end] from a callback's inputs intersects the dates of a batch (open ends overlap)
+    if start is not None and pd.Timestamp(start) > change['end']:
+        return False
+    if end is not None and pd.Timestamp(end) < change['start']:
+        return False
+    return True
+
+
+class IngestWatcher:
+    # Polls a drop directory and hands every new CSV/Parquet file to `apply` once.
+    # Writers should create files under a temporary name and rename them into place.
+    # Everything in the directory is applied again at startup, on top of the base dataset.
+
+    def __init__(self, directory, apply, interval=5.0):
+        self.directory = directory
+        self.apply = apply
+        self.interval = interval
+        self.seen = set()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def poll(self):
+        applied = 0
+        for name in sorted(os.listdir(self.directory)):
+            if name in self.seen or name.startswith('.') or not name.endswith(BATCH_SUFFIXES):
+                continue
+            self.seen.add(name)
+            path = os.path.join(self.directory, name)
+            try:
+                batch = read_batch(path)
+                if not batch.empty:
+                    self.apply(batch)
+                applied += 1
+                logger.info("Ingested %s (%d rows)", path, len(batch))
+            except Exception:
+                logger.exception("Could not ingest %s", path)
+        return applied
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.poll()
+            except OSError:
+                logger.exception("Could not scan %s", self.directory)
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, name='ingest-watcher', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
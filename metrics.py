@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, request
+
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNTERS = {
+    'calls': "Callback invocations, figure cache hits included",
+    'slow_calls': "Callback invocations slower than SLOW_CALLBACK_SECONDS",
+    'rows_scanned': "Pre-aggregated rows read by the callback filters",
+    'groups_produced': "Rows returned by the callback aggregations",
+    'response_bytes': "Size of the JSON responses sent back to the browser",
+    'figure_pool_fallbacks': "Figures built on the callback thread because the figure pool had not started them",
+    'figure_pool_timeouts': "Callbacks left without an update because a figure ran past FIGURE_POOL_TIMEOUT_SECONDS",
+}
+
+
+def prometheus_metric(name, kind, description, samples):
+    # samples: (labels dict, value) pairs of one metric family
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
+
+
+class CallbackMetrics:
+    # Per-callback phase timings and counters. instrument() marks the callback running on the current
+    # thread, so span() and count() inside its body need no callback name; a phase entered several
+    # times during one call is recorded once, with the summed time.
+
+    def __init__(self, slow_seconds=0, buckets=BUCKETS):
+        self.slow_seconds = slow_seconds
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # (callback, phase) -> bucket counts followed by the running sum and count
+        self.histograms = {}
+        # (counter, callback) -> value
+        self.counters = {}
+
+    def observe(self, callback, phase, seconds):
+        with self.lock:
+            histogram = self.histograms.setdefault((callback, phase), [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def count(self, counter, value=1, callback=None):
+        callback = callback or getattr(self.local, 'callback', None)
+        if callback is None:
+            return
+        with self.lock:
+            self.counters[(counter, callback)] = self.counters.get((counter, callback), 0) + value
+
+    @contextmanager
+    def span(self, phase):
+        phases = getattr(self.local, 'phases', None)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if phases is not None:
+                phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - started
+
+    def instrument(self, func):
+        name = func.__name__
+
+        @wraps(func)
+        def wrapper(*args):
+            outer = getattr(self.local, 'callback', None), getattr(self.local, 'phases', None)
+            self.local.callback, self.local.phases = name, {}
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = time.perf_counter() - started
+                phases = self.local.phases
+                self.local.callback, self.local.phases = outer
+                self.local.last_call = (name, elapsed)
+                for phase, seconds in phases.items():
+                    self.observe(name, phase, seconds)
+                self.observe(name, 'total', elapsed)
+                self.count('calls', callback=name)
+                if self.slow_seconds and elapsed >= self.slow_seconds:
+                    self.count('slow_calls', callback=name)
+                    logger.warning("Slow callback %s took %.3f s with inputs %r", name, elapsed, args)
+        return wrapper
+
+    def attach(self, server, update_path='/_dash-update-component'):
+        # Whatever a callback request spends outside the callback itself is mostly JSON serialization
+        @server.before_request
+        def start_callback_timer():
+            if request.path.endswith(update_path):
+                g.callback_request_started = time.perf_counter()
+                self.local.last_call = None
+
+        @server.after_request
+        def record_callback_response(response):
+            started = g.get('callback_request_started')
+            last_call = getattr(self.local, 'last_call', None)
+            if started is not None and last_call is not None and not response.direct_passthrough:
+                name, elapsed = last_call
+                self.observe(name, 'serialize', max(time.perf_counter() - started - elapsed, 0.0))
+                self.count('response_bytes', len(response.get_data()), callback=name)
+            return response
+
+    def render(self, extra=()):
+        # Prometheus text exposition; `extra` adds (name, kind, description, samples) families
+        with self.lock:
+            histograms = {key: list(value) for key, value in self.histograms.items()}
+            counters = dict(self.counters)
+
+        lines = ["# HELP dash_callback_phase_seconds Time spent in each phase of a callback",
+                 "# TYPE dash_callback_phase_seconds histogram"]
+        for (callback, phase), histogram in sorted(histograms.items()):
+            labels = f'callback="{callback}",phase="{phase}"'
+            for bound, observed in zip(self.buckets, histogram):
+                lines.append(f'dash_callback_phase_seconds_bucket{{{labels},le="{bound}"}} {observed}')
+            lines.append(f'dash_callback_phase_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+            lines.append(f"dash_callback_phase_seconds_sum{{{labels}}} {histogram[-2]}")
+            lines.append(f"dash_callback_phase_seconds_count{{{labels}}} {histogram[-1]}")
+
+        for counter, description in COUNTERS.items():
+            samples = [({'callback': callback}, value)
+                       for (name, callback), value in sorted(counters.items()) if name == counter]
+            lines += prometheus_metric(f"dash_callback_{counter}_total", 'counter', description, samples)
+
+        for family in extra:
+            lines += prometheus_metric(*family)
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,28 @@
+import time
+
+
+class StartupProfile:
+    # Wall-clock time of each startup phase: mark(name) closes the phase that ran since the previous mark
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def as_dict(self):
+        return {
+            'phases': [{'phase': name, 'ms': round(seconds * 1000, 1)} for name, seconds in self.phases],
+            'total_ms': round((self.last - self.started) * 1000, 1),
+        }
+
+    def report(self):
+        lines = [f"{'phase':<32}{'ms':>10}"]
+        for name, seconds in self.phases:
+            lines.append(f"{name:<32}{seconds * 1000:>10.1f}")
+        lines.append(f"{'total':<32}{(self.last - self.started) * 1000:>10.1f}")
+        return '\n'.join(lines)
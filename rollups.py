@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from data_loader import concat_frames
+
+
+GASES = ['O3', 'CO', 'SO2', 'NO2']
+ROLLUP_KEYS = ['Time_zone', 'State', 'City', 'Date']
+
+# Measure name used by the callbacks -> raw dataset column
+MEASURES = {
+    f"{gas}_{stat.replace(' ', '_')}": f"{gas} {stat}"
+    for gas in GASES
+    for stat in ['Mean', 'AQI', '1st Max Hour']
+}
+
+
+def build_rollup(frame):
+    # One row per (Time_zone, State, City, Date) holding a sum and a non-null count per measure,
+    # so any coarser grouping can be rebuilt exactly from it (sums add up, means are sum / count)
+    aggregations = {}
+    for measure, column in MEASURES.items():
+        aggregations[f"{measure}_sum"] = pd.NamedAgg(column=column, aggfunc='sum')
+        aggregations[f"{measure}_count"] = pd.NamedAgg(column=column, aggfunc='count')
+
+    cube = frame.groupby(ROLLUP_KEYS, observed=True).agg(**aggregations).reset_index()
+
+    # int32 rather than the smallest fit, so merged batches cannot overflow the counts
+    for measure in MEASURES:
+        cube[f"{measure}_count"] = cube[f"{measure}_count"].astype(np.int32)
+
+    return cube
+
+
+def rollup_agg(cube, by, sums=(), means=()):
+    # Regroup a slice of the rollup: `sums` are summed, `means` are averaged over the raw rows
+    columns = [f"{measure}_sum" for measure in sums]
+    for measure in means:
+        columns += [f"{measure}_sum", f"{measure}_count"]
+    columns = list(dict.fromkeys(columns))
+
+    grouped = cube.groupby(by, observed=True)[columns].sum()
+
+    result = pd.DataFrame(index=grouped.index)
+    for measure in sums:
+        result[measure] = grouped[f"{measure}_sum"]
+    for measure in means:
+        result[measure] = grouped[f"{measure}_sum"] / grouped[f"{measure}_count"]
+
+    return result.reset_index()
+
+
+def merge_rollups(cube, batch_cube):
+    # Fold a batch rollup into the existing one; only rows that can share a key with the batch are regrouped
+    if batch_cube.empty:
+        return cube
+
+    overlap = (cube['Date'].between(batch_cube['Date'].min(), batch_cube['Date'].max())
+               & cube['State'].isin(batch_cube['State'].unique()))
+
+    touched = concat_frames([cube[overlap], batch_cube])
+    touched = touched.groupby(ROLLUP_KEYS, observed=True).sum().reset_index()
+
+    return concat_frames([cube[~overlap], touched])
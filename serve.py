@@ -0,0 +1,55 @@
+import config
+
+
+def gunicorn_options():
+    options = {
+        'bind': config.SERVER_BIND,
+        'workers': config.SERVER_WORKERS,
+        'threads': config.SERVER_THREADS,
+        'timeout': config.SERVER_TIMEOUT,
+        # Load the app once in the master: the memory-mapped dataset and everything derived
+        # from it are then shared copy-on-write by every forked worker
+        'preload_app': config.SERVER_PRELOAD,
+    }
+    if config.SERVER_THREADS > 1:
+        options['worker_class'] = 'gthread'
+    if config.INGEST_DIR and config.SERVER_PRELOAD:
+        options['post_fork'] = start_worker_ingest
+    return options
+
+
+def start_worker_ingest(server, worker):
+    # The watcher thread has to live in each worker, not in the preloading master
+    import app
+    app.start_ingest_watcher()
+
+
+def main():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("serve.py needs gunicorn: pip install gunicorn")
+
+    class DashApplication(BaseApplication):
+
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            config.DEBUG = False
+            # Threads do not survive fork, so the pre-warm has to finish before workers start
+            config.FIGURE_CACHE_PREWARM_BACKGROUND = False
+            config.INGEST_AUTOSTART = not config.SERVER_PRELOAD
+            from app import server
+            return server
+
+    DashApplication(gunicorn_options()).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+def iqr_bounds(frame, columns, threshold=1.5, by=None):
+    # All quartiles in one quantile() pass; per group when `by` is given
+    if by is None:
+        quartiles = frame[columns].quantile([0.25, 0.75])
+        q1, q3 = quartiles.loc[0.25], quartiles.loc[0.75]
+    else:
+        quartiles = frame.groupby(by, observed=True)[columns].quantile([0.25, 0.75])
+        if quartiles.empty:
+            # No groups (e.g. a cleared state dropdown): the quantile level holds no 0.25 to select
+            q1 = q3 = quartiles.droplevel(-1)
+        else:
+            q1, q3 = quartiles.xs(0.25, level=-1), quartiles.xs(0.75, level=-1)
+
+    iqr = q3 - q1
+    return q1 - threshold * iqr, q3 + threshold * iqr
+
+
+def outlier_mask(frame, columns, bounds, by=None):
+    # True for rows inside the bounds on every column (rows with a missing value are dropped)
+    lower, upper = bounds
+    values = frame[columns].to_numpy(dtype=np.float64)
+
+    if by is None:
+        lower, upper = lower[columns].to_numpy(), upper[columns].to_numpy()
+    else:
+        lower = lower[columns].reindex(frame[by]).to_numpy()
+        upper = upper[columns].reindex(frame[by]).to_numpy()
+
+    with np.errstate(invalid='ignore'):
+        return ((values >= lower) & (values <= upper)).all(axis=1)
+
+
+def remove_outliers_iqr(df, columns, threshold=1.5, by=None, bounds=None):
+    # Single combined mask and a single copy, instead of one filtered frame per column
+    if bounds is None:
+        bounds = iqr_bounds(df, columns, threshold, by)
+    return df[outlier_mask(df, columns, bounds, by)]
+
+
+def grouped_ols(frame, x, y, by):
+    # Closed-form least squares per group from five running sums
+    valid = frame[[x, y]].notna().all(axis=1).to_numpy()
+    codes, groups = pd.factorize(frame[by].to_numpy()[valid], sort=True)
+    x_values = frame[x].to_numpy(dtype=np.float64)[valid]
+    y_values = frame[y].to_numpy(dtype=np.float64)[valid]
+
+    count = np.bincount(codes, minlength=len(groups))
+    sum_x = np.bincount(codes, x_values, minlength=len(groups))
+    sum_y = np.bincount(codes, y_values, minlength=len(groups))
+    sum_xx = np.bincount(codes, x_values * x_values, minlength=len(groups))
+    sum_xy = np.bincount(codes, x_values * y_values, minlength=len(groups))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (count * sum_xy - sum_x * sum_y) / (count * sum_xx - sum_x * sum_x)
+        intercept = (sum_y - slope * sum_x) / count
+
+    x_min = np.full(len(groups), np.nan)
+    x_max = np.full(len(groups), np.nan)
+    np.fmin.at(x_min, codes, x_values)
+    np.fmax.at(x_max, codes, x_values)
+
+    return pd.DataFrame({by: groups, 'slope': slope, 'intercept': intercept, 'x_min': x_min, 'x_max': x_max})
+
+
+def add_trendlines(fig, fits, by):
+    # One line per scatter trace, matching its colour and legend group like px's trendline="ols"
+    fits = fits.set_index(by)
+    for trace in list(fig.data):
+        if trace.name not in fits.index:
+            continue
+        fit = fits.loc[trace.name]
+        if not np.isfinite(fit['slope']):
+            continue
+        x_line = [fit['x_min'], fit['x_max']]
+        fig.add_trace(go.Scatter(
+            x=x_line,
+            y=[fit['slope'] * value + fit['intercept'] for value in x_line],
+            mode='lines',
+            name=trace.name,
+            legendgroup=trace.legendgroup,
+            showlegend=False,
+            line={'color': trace.marker.color},
+            hovertemplate=f"<b>OLS trendline</b><br>y = {fit['slope']:.4g} * x + {fit['intercept']:.4g}<extra>{trace.name}</extra>"
+        ))
+    return fig